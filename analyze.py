@@ -0,0 +1,138 @@
+"""Replays finished games from their logs and stores both players' equity at every decision in the analysis table
+
+Usage:
+    python analyze.py [--chunk 100] [--workers N]
+
+Each hand's cards are re-dealt from the seed recorded in the hands table. Seeds carry no hand number, so they are
+matched to the log's hands in order, and a game is only analysed if it has exactly one seed per hand in its log; games
+that were already under way when seeds started being recorded are skipped whole. Games are read in chunks of finished games (ordered by id), analysed across a process pool and written
+back one chunk at a time, so memory stays bounded however large the archive is. Re-running replaces earlier results.
+"""
+
+import argparse
+import os
+from multiprocessing import Pool
+
+import evaluator
+from database import get_database, transaction
+from dealing import deal
+from engine import estimate_strength
+from equity import exact_equity, visible_board
+from migrations import migrate
+
+# Log entries that start a street
+STREET_MARKERS = {"Preflop:": "preflop", "Flop:": "flop", "Turn:": "turn", "River:": "river"}
+
+# Rows per multi-row insert into the analysis table. CS50's SQL parses every statement with sqlparse, which gives up
+# at 10,000 tokens (about 350 rows of 8 placeholders), so each insert stays well under that.
+INSERT_BATCH = 100
+
+# Player actions in the log, matched by how the entry ends (raises end with the size)
+ACTIONS = [(" calls", "call"), (" checks", "check"), (" folds", "fold")]
+
+
+"""Returns (actor, action) for a log entry that is a move, or None for any other entry"""
+def parse_action(entry):
+    actor = "bot" if entry.startswith("Opponent ") else "player"
+    if " raises to " in entry:
+        return actor, "raise"
+    for ending, action in ACTIONS:
+        if entry.endswith(ending):
+            return actor, action
+    return None
+
+
+"""Returns analysis rows for one game, given its log entries in order and the seed of each hand it dealt"""
+def analyze_game(task):
+
+    game_id, entries, seeds = task
+    rows = []
+    hand_number = -1
+    street = None
+    equities = {}
+
+    for entry in entries:
+        if entry in STREET_MARKERS:
+            street = STREET_MARKERS[entry]
+            if street == "preflop":
+                hand_number += 1
+                equities = {}
+            continue
+
+        move = parse_action(entry)
+        if move is None or street is None:
+            continue
+
+        # Exact head-to-head equity and the bot's own estimate against a random hand, computed once per street
+        if street not in equities:
+            cards = deal(seeds[hand_number])
+            board = evaluator.parse_cards(visible_board(cards['board'], street))
+            player_equity = exact_equity([evaluator.parse_cards(cards['hand']), evaluator.parse_cards(cards['opp_hand'])], board)['equity'][0]
+            equities[street] = (player_equity, estimate_strength(cards['opp_hand'], cards['board'], street))
+
+        player_equity, bot_strength = equities[street]
+        rows.append((game_id, hand_number, street, move[0], move[1], player_equity, 1 - player_equity, bot_strength))
+
+    return rows
+
+
+"""Returns analysis tasks for a chunk of game ids: (game id, log entries in order, hand seeds in order), for the games with a seed for every hand"""
+def load_tasks(db, game_ids):
+
+    placeholders = ", ".join("?" for game_id in game_ids)
+    logs = db.execute("SELECT id, game_id FROM logs WHERE game_id IN (" + placeholders + ")", *game_ids)
+    if len(logs) == 0:
+        return []
+    game_of_log = {log['id']: log['game_id'] for log in logs}
+    log_placeholders = ", ".join("?" for log in logs)
+
+    entries = {game_id: [] for game_id in game_ids}
+    for row in db.execute("SELECT log_id, entry FROM entries WHERE log_id IN (" + log_placeholders + ") ORDER BY id", *game_of_log):
+        entries[game_of_log[row['log_id']]].append(row['entry'])
+    seeds = {game_id: [] for game_id in game_ids}
+    for row in db.execute("SELECT log_id, seed FROM hands WHERE log_id IN (" + log_placeholders + ") ORDER BY id", *game_of_log):
+        seeds[game_of_log[row['log_id']]].append(row['seed'])
+
+    # Every hand dealt logs one "Preflop:" and records one seed, so a game with fewer seeds has hands that can't be placed
+    return [(game_id, entries[game_id], seeds[game_id]) for game_id in game_ids
+            if seeds[game_id] and len(seeds[game_id]) == entries[game_id].count("Preflop:")]
+
+
+"""Replaces the analysis rows of a chunk of games using multi-row inserts in one transaction"""
+def store_rows(db, game_ids, rows):
+    with transaction(db):
+        db.execute("DELETE FROM analysis WHERE game_id IN (" + ", ".join("?" for game_id in game_ids) + ")", *game_ids)
+        for start in range(0, len(rows), INSERT_BATCH):
+            batch = rows[start:start + INSERT_BATCH]
+            db.execute("INSERT INTO analysis (game_id, hand, street, actor, action, player_equity, bot_equity, bot_strength) VALUES "
+                       + ", ".join("(?, ?, ?, ?, ?, ?, ?, ?)" for row in batch), *[value for row in batch for value in row])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Equity analysis of finished games")
+    parser.add_argument("--chunk", type=int, default=100, help="finished games read and written per chunk")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    db = get_database()
+    migrate(db)
+
+    # Pages through finished games by id, so each chunk is one indexed range scan rather than an ever-growing offset
+    last_id = 0
+    games = decisions = 0
+    with Pool(args.workers) as pool:
+        while True:
+            game_ids = [row['id'] for row in db.execute("SELECT id FROM games WHERE active = 0 AND id > ? ORDER BY id LIMIT ?", last_id, args.chunk)]
+            if len(game_ids) == 0:
+                break
+            last_id = game_ids[-1]
+
+            rows = [row for game_rows in pool.imap(analyze_game, load_tasks(db, game_ids)) for row in game_rows]
+            store_rows(db, game_ids, rows)
+            games += len(game_ids)
+            decisions += len(rows)
+            print("Analysed %d games, %d decisions" % (games, decisions))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,17 @@
 import os
 
-from cs50 import SQL
-from flask import Flask, flash, redirect, render_template, request, session
+from flask import Flask, flash, jsonify, redirect, render_template, request, session
 from flask_session import Session
 from tempfile import mkdtemp
 from werkzeug.exceptions import default_exceptions, HTTPException, InternalServerError
 from werkzeug.security import check_password_hash, generate_password_hash
 
-from helpers import login_required, render_hand, compare_hands, bot_strength, bot_action, next_street, showdown, reset, all_in, win, points
+import evaluator
+from database import get_database
+from engine import Engine, GameState, InvalidAction
+from equity import check_deal
+from helpers import login_required, compute_strength, service_exact, bot_policy, load_game, create_game, save_state, log_entries, win, points
+from migrations import migrate
 
 # Configure application
 app = Flask(__name__)
@@ -30,8 +34,11 @@ app.config["SESSION_PERMANENT"] = False
 app.config["SESSION_TYPE"] = "filesystem"
 Session(app)
 
-# Configure CS50 Library to use SQLite database
-db = SQL("sqlite:///poker.db")
+# Configure CS50 Library to use the database, sharing helpers.py's handle (SQLite or PostgreSQL, see database.py)
+db = get_database()
+
+# Brings the schema up to date (see migrations.py); workers starting at once take turns
+migrate(db)
 
 
 @app.route("/")
@@ -95,23 +102,23 @@ def profile():
 @login_required
 def game():
 
-    if request.method == "GET":
+    # The rules live in engine.py; this route loads the game's state (with its log id and the username) in one query,
+    # applies the player's move in memory and saves it with one update and a bulk log insert
+    game = load_game(session["user_id"])
 
-        game = db.execute("SELECT * FROM games WHERE player_id = ? AND active = 1", session["user_id"])
-        entries = db.execute("SELECT * FROM entries WHERE log_id = (SELECT id FROM logs WHERE game_id = (SELECT id FROM games WHERE player_id = ? AND active = 1))", session["user_id"])
-        username = db.execute("SELECT username FROM users WHERE id = ?", session["user_id"])[0]['username']
+    if request.method == "GET":
 
         # Checks if user is in active game
-        if len(game) > 0:
+        if game is not None:
 
-            game = db.execute("SELECT * FROM games WHERE player_id = ? AND active = 1", session["user_id"])[0]
-            log_id = db.execute("SELECT id FROM logs WHERE game_id = (SELECT id FROM games WHERE player_id = ? AND active = 1)", session["user_id"])[0]['id']
+            engine = Engine(game['username'], strength=compute_strength, bot=bot_policy, allin_equity=service_exact)
+            state = GameState.from_row(game)
 
             # Checks if user just came from showdown
-            if game['displayed'] == 1:
+            if state.displayed == 1:
 
                 # If user or bot won, end game and redirect to play
-                win_status = win(session["user_id"])
+                win_status = win(game, state)
                 if win_status == 1:
                     flash("You Won!")
                     return redirect("/play")
@@ -119,277 +126,61 @@ def game():
                     flash("You Lost!")
                     return redirect("/play")
 
-                # Reset hands, board, and position
-                reset(session["user_id"])
-
-                # Calculates bot's new hand strength
-                hand_strength = bot_strength(session["user_id"])
-
-                # Updates game to represent new hands, board, and position
-                game = db.execute("SELECT * FROM games WHERE player_id = ? AND active = 1", session["user_id"])[0]
-
-                # If in the big blind, let the bot make the first move
-                if game['position'] == "bb":
-                    bot_move = bot_action(hand_strength, session["user_id"])
-                    db.execute("INSERT INTO entries (entry, log_id) VALUES (?, ?)", bot_move, log_id)
-                    # If bot folds, reset the board again
-                    if bot_move == "Opponent folds":
-                        db.execute("INSERT INTO entries (entry, log_id) VALUES (?, ?)", username + " wins pot of 3", log_id)
-                        reset(session["user_id"])
-
-                # Set displayed to 0
-                db.execute("UPDATE games SET displayed = 0 WHERE player_id = ? AND active = 1", session["user_id"])
-
-                # Updates game to represent new hands, board, and position
-                game = db.execute("SELECT * FROM games WHERE player_id = ? AND active = 1", session["user_id"])[0]
-                entries = db.execute("SELECT * FROM entries WHERE log_id = ?", log_id)
+                # Deals the next hand (the bot moves first if the user is in the big blind) and saves it
+                outcome = engine.next_hand(state)
+                save_state(game, state)
 
-            return render_template("game.html", hand=game['hand'], opp_hand=game['opp_hand'], board=game['board'], street=game['street'], position=game['position'], chips=game['chips'], opp_chips=game['opp_chips'], pot=game['pot'], bet=game['bet'], opp_bet=game['opp_bet'], entries=entries)
-
-        # Renders hand
-        hand_info = render_hand()
+                # A blind that put a player all in goes straight to showdown
+                if outcome == "showdown":
+                    return redirect("/display")
 
-        # Creates new game
-        db.execute("INSERT INTO games (player_id, active, chips, opp_chips, pot, position, street, hand, opp_hand, board, bet, opp_bet, displayed) VALUES (?, 1, 99, 98, 0, 'sb', 'preflop', ?, ?, ?, 1, 2, 0)", session["user_id"], hand_info['hand'], hand_info['opp_hand'], hand_info['board'])
+            # Only the latest entries are rendered; the page fetches earlier ones from /log on request
+            entries, earlier = log_entries(game['log_id'])
 
-        # Create new log
-        db.execute("INSERT INTO logs (game_id) SELECT id FROM games WHERE player_id = ? AND active = 1", session["user_id"])
+            return render_template("game.html", hand=state.hand, opp_hand=state.opp_hand, board=state.board, street=state.street, position=state.position, chips=state.chips, opp_chips=state.opp_chips, pot=state.pot, bet=state.bet, opp_bet=state.opp_bet, entries=entries, earlier=earlier)
 
-        # Adds Preflop: as the first entry of the log
-        log_id = db.execute("SELECT id FROM logs WHERE game_id = (SELECT id FROM games WHERE player_id = ? AND active = 1)", session["user_id"])[0]['id']
-        db.execute("INSERT INTO entries (entry, log_id) VALUES (?, ?)", "Preflop:", log_id)
+        # Deals a new game, then creates it with its log and first entries
+        username = db.execute("SELECT username FROM users WHERE id = ?", session["user_id"])[0]['username']
+        state = Engine(username, strength=compute_strength, bot=bot_policy, allin_equity=service_exact).new_game()
+        game = create_game(session["user_id"], state)
 
-        entries = db.execute("SELECT * FROM entries WHERE log_id = ?", log_id)
+        entries, earlier = log_entries(game['log_id'])
 
-        return render_template("game.html", hand=hand_info['hand'], opp_hand=hand_info['opp_hand'], board=hand_info['board'], street="preflop", position="sb", chips=99, opp_chips=98, pot=0, bet=1, opp_bet=2, entries=entries)
+        return render_template("game.html", hand=state.hand, opp_hand=state.opp_hand, board=state.board, street=state.street, position=state.position, chips=state.chips, opp_chips=state.opp_chips, pot=state.pot, bet=state.bet, opp_bet=state.opp_bet, entries=entries, earlier=earlier)
 
     if request.method == "POST":
 
-        game = db.execute("SELECT * FROM games WHERE player_id = ? AND active = 1", session["user_id"])[0]
-        username = db.execute("SELECT username FROM users WHERE id = ?", session["user_id"])[0]['username']
-        log_id = db.execute("SELECT id FROM logs WHERE game_id = (SELECT id FROM games WHERE player_id = ? AND active = 1)", session["user_id"])[0]['id']
-        hand_strength = bot_strength(session["user_id"])
-
-        """PLAYER CALLS"""
-        if "call" in request.form.to_dict():
-
-            # Checks for invalid calls
-            if game['bet'] >= game['opp_bet']:
-                flash("Invalid Call")
-                return redirect("/game")
-
-            # Updates user's chips
-            db.execute("UPDATE games SET chips = ? WHERE player_id = ? AND active = 1", game['chips'] - game['opp_bet'] + game['bet'], session["user_id"])
-
-            # Updates user's bet
-            db.execute("UPDATE games SET bet = ? WHERE player_id = ? AND active = 1", game['opp_bet'], session["user_id"])
-
-            # Logs user's call
-            db.execute("INSERT INTO entries (entry, log_id) VALUES (?, ?)", username + " calls", log_id)
-
-            # If the call puts the user all in, go to showdown
-            if all_in(session["user_id"]) == 1:
-                while game['street'] != "river":
-                    next_street(session["user_id"])
-                    game = db.execute("SELECT * FROM games WHERE player_id = ? AND active = 1", session["user_id"])[0]
-                showdown(session["user_id"])
-                db.execute("UPDATE games SET displayed = 1 WHERE player_id = ? AND active = 1", session["user_id"])
-                return redirect("/display")
-
-            # If it is preflop and player is calling the big blind, the bot can still move
-            elif game['street'] == "preflop" and game['opp_bet'] == 2:
-                bot_move = bot_action(hand_strength, session["user_id"])
-                db.execute("INSERT INTO entries (entry, log_id) VALUES (?, ?)", bot_move, log_id)
-                # If bot checks, ends action and goes to next street, where if player is in the small blind, the bot acts again.
-                if bot_move == "Opponent checks":
-                    next_street(session["user_id"])
-                    if game['position'] == "sb":
-                        bot_move2 = bot_action(hand_strength, session["user_id"])
-                        db.execute("INSERT INTO entries (entry, log_id) VALUES (?, ?)", bot_move2, log_id)
-
-            # When the call ends action, go to the next street. If the player is in the small blind, the bot acts first.
-            elif game['street'] != "river":
-                next_street(session["user_id"])
-                if game['position'] == "sb":
-                    bot_move = bot_action(hand_strength, session["user_id"])
-                    db.execute("INSERT INTO entries (entry, log_id) VALUES (?, ?)", bot_move, log_id)
-
-            # When the call ends action on the river, go to showdown
-            else:
-                showdown(session["user_id"])
-                db.execute("UPDATE games SET displayed = 1 WHERE player_id = ? AND active = 1", session["user_id"])
-                return redirect("/display")
-
+        if game is None:
+            return redirect("/play")
+        engine = Engine(game['username'], strength=compute_strength, bot=bot_policy, allin_equity=service_exact)
+
+        # Finds which button the user pressed
+        form = request.form.to_dict()
+        action = None
+        for name in ["call", "raise", "check", "fold"]:
+            if name in form:
+                action = name
+                break
+        if action is None:
             return redirect("/game")
 
-        """PLAYER RAISES"""
-        if "raise" in request.form.to_dict():
-
-            # Checks for invalid raises
-            if not request.form.get("raise_size"):
-                flash("Must enter raise size")
-                return redirect("/game")
+        raise_size = None
+        if action == "raise" and request.form.get("raise_size"):
             raise_size = int(request.form.get("raise_size"))
-            if (game['bet'] < game['opp_bet'] and raise_size < game['opp_bet'] + 2 and raise_size != game['chips']) or raise_size < 2 or raise_size <= game['bet']:
-                flash("Invalid raise size (must min raise)")
-                return redirect("/game")
-            if raise_size > game['chips'] + game['bet']:
-                flash("Not enough chips")
-                return redirect("/game")
-
-            # If raise size is larger than bot's stack, adjust so it is exactly all in
-            if raise_size > game['opp_chips'] + game['opp_bet']:
-                raise_size = game['opp_chips'] + game['opp_bet']
-
-            # Updates bet size
-            db.execute("UPDATE games SET bet = ? WHERE player_id = ? AND active = 1", raise_size, session["user_id"])
-
-            # Updates user's stack
-            db.execute("UPDATE games SET chips = ? WHERE player_id = ? AND active = 1", game['chips'] - raise_size + game['bet'], session["user_id"])
-
-            # Logs user's raise
-            db.execute("INSERT INTO entries (entry, log_id) VALUES (?, ?)", username + " raises to " + str(raise_size), log_id)
-
-            # Saves board state for log entry later
-            game = db.execute("SELECT * FROM games WHERE player_id = ? AND active = 1", session["user_id"])[0]
-
-            # Bot moves and logs it
-            bot_move = bot_action(hand_strength, session["user_id"])
-            db.execute("INSERT INTO entries (entry, log_id) VALUES (?, ?)", bot_move, log_id)
-
-            if bot_move == "Opponent folds":
-
-                # Logs user winning pot
-                username = db.execute("SELECT username FROM users WHERE id = ?", session["user_id"])[0]['username']
-                db.execute("INSERT INTO entries (entry, log_id) VALUES (?, ?)", username + " wins pot of " + str(game['bet'] + game['opp_bet'] + game['pot']), log_id)
-
-                # Resets hands, board, and position and updates game
-                reset(session["user_id"])
-                game = db.execute("SELECT * FROM games WHERE player_id = ? AND active = 1", session["user_id"])[0]
-
-                # If new position is big blind, let bot move
-                if game['position'] == "bb":
-
-                    # Updates hand strength
-                    hand_strength = bot_strength(session["user_id"])
-
-                    # Bot moves and logs it
-                    bot_move2 = bot_action(hand_strength, session["user_id"])
-                    db.execute("INSERT INTO entries (entry, log_id) VALUES (?, ?)", bot_move2, log_id)
-
-                    # If the bot folds, logs user winning the pot and resets the board
-                    if bot_move2 == "Opponent folds":
-                        db.execute("INSERT INTO entries (entry, log_id) VALUES (?, ?)", username + " wins pot of 3", log_id)
-                        reset(session["user_id"])
-
-            if bot_move == "Opponent calls":
-
-                # If bot calls all in, go to showdown
-                if all_in(session["user_id"]) == 1:
-                    while game['street'] != "river":
-                        next_street(session["user_id"])
-                        game = db.execute("SELECT * FROM games WHERE player_id = ? AND active = 1", session["user_id"])[0]
-                    showdown(session["user_id"])
-                    db.execute("UPDATE games SET displayed = 1 WHERE player_id = ? AND active = 1", session["user_id"])
-                    return redirect("/display")
-
-                # If bot calls and it's not the river, advance to next street
-                elif game['street'] != "river":
-                    next_street(session["user_id"])
-                    # If user is in the small blind, let the bot act first
-                    if game['position'] == "sb":
-                        bot_move2 = bot_action(hand_strength, session["user_id"])
-                        db.execute("INSERT INTO entries (entry, log_id) VALUES (?, ?)", bot_move2, log_id)
-
-                # Otherwise, bot call ends action on the river and goes to showdown
-                else:
-                    showdown(session["user_id"])
-                    db.execute("UPDATE games SET displayed = 1 WHERE player_id = ? AND active = 1", session["user_id"])
-                    return redirect("/display")
 
+        # Applies the user's move and the bot's responses, rejecting invalid moves without saving anything
+        state = GameState.from_row(game)
+        try:
+            outcome = engine.step(state, action, raise_size)
+        except InvalidAction as error:
+            flash(str(error))
             return redirect("/game")
 
-        """PLAYER CHECKS"""
-        if "check" in request.form.to_dict():
-
-            # Checks for invalid checks
-            if game['bet'] != game['opp_bet']:
-                flash("Invalid check")
-                return redirect("/game")
-
-            # Logs user's check
-            db.execute("INSERT INTO entries (entry, log_id) VALUES (?, ?)", username + " checks", log_id)
-
-            # If the user is in the small blind, check ends action
-            if game['position'] == "sb":
-                if game['street'] != "river":
-                    next_street(session["user_id"])
-                    bot_move = bot_action(hand_strength, session["user_id"])
-                    db.execute("INSERT INTO entries (entry, log_id) VALUES (?, ?)", bot_move, log_id)
-                else:
-                    showdown(session["user_id"])
-                    db.execute("UPDATE games SET displayed = 1 WHERE player_id = ? AND active = 1", session["user_id"])
-                    return redirect("/display")
-
-            # If not preflop and in the big blind, check gives next move to the bot
-            elif game['street'] != "preflop":
-
-                # Bot moves and logs it
-                bot_move = bot_action(hand_strength, session["user_id"])
-                db.execute("INSERT INTO entries (entry, log_id) VALUES (?, ?)", bot_move, log_id)
-
-                # If bot checks, ends action
-                if bot_move == "Opponent checks":
-                    if game['street'] != "river":
-                        next_street(session["user_id"])
-                    else:
-                        showdown(session["user_id"])
-                        db.execute("UPDATE games SET displayed = 1 WHERE player_id = ? AND active = 1", session["user_id"])
-                        return redirect("/display")
-
-            # If preflop and in the big blind, check ends action and goes to next street
-            else:
-                next_street(session["user_id"])
-
-            return redirect("/game")
-
-        """PLAYER FOLDS"""
-        if "fold" in request.form.to_dict():
-
-            # Checks for invalid folds
-            if game['bet'] == game['opp_bet']:
-                flash("Invalid fold")
-                return redirect("/game")
-
-            # Gives pot and bets to opp stack
-            db.execute("UPDATE games SET opp_chips = ? WHERE player_id = ? AND active = 1", game['opp_chips'] + game['bet'] + game['opp_bet'] + game['pot'], session["user_id"])
-
-            # Logs fold and opponent winning pot
-            db.execute("INSERT INTO entries (entry, log_id) VALUES (?, ?)", username + " folds", log_id)
-            db.execute("INSERT INTO entries (entry, log_id) VALUES (?, ?)", "Opponent wins pot of " + str(game['bet'] + game['opp_bet'] + game['pot']), log_id)
-
-            # Clears pot and bets
-            db.execute("UPDATE games SET pot = ?, bet = ?, opp_bet = ? WHERE player_id = ? AND active = 1", 0, 0, 0, session["user_id"])
-
-            # Resets hands and board
-            reset(session["user_id"])
-
-            # Updating bot's hand strength and game state
-            hand_strength = bot_strength(session["user_id"])
-            game = db.execute("SELECT * FROM games WHERE player_id = ? AND active = 1", session["user_id"])[0]
-
-            # If user is in the big blind next hand, bot acts first
-            if game['position'] == "bb":
-
-                bot_move = bot_action(hand_strength, session["user_id"])
-                db.execute("INSERT INTO entries (entry, log_id) VALUES (?, ?)", bot_move, log_id)
+        save_state(game, state)
 
-                # If bot folds next hand, reset and advance
-                if bot_move == "Opponent folds":
-                    db.execute("INSERT INTO entries (entry, log_id) VALUES (?, ?)", username + " wins pot of 3", log_id)
-                    reset(session["user_id"])
-
-            return redirect("/game")
+        # Shows both hands after a showdown
+        if outcome == "showdown":
+            return redirect("/display")
 
         return redirect("/game")
 
@@ -422,10 +213,13 @@ def register():
             flash("Passwords must match")
             return redirect("/register")
 
-        db.execute("INSERT INTO users (username, password, wins, losses) VALUES (?, ?, 0, 0)", request.form.get(
-            "username"), generate_password_hash(request.form.get("password")))
-
-        session["user_id"] = db.execute("SELECT id FROM users WHERE username = ?", request.form.get("username"))[0]["id"]
+        # The unique index on usernames catches anyone who registered the same name since the check above
+        try:
+            session["user_id"] = db.execute("INSERT INTO users (username, password, wins, losses) VALUES (?, ?, 0, 0)", request.form.get(
+                "username"), generate_password_hash(request.form.get("password")))
+        except ValueError:
+            flash("Username already taken")
+            return redirect("/register")
 
         flash("Registered!")
 
@@ -481,6 +275,40 @@ def logout():
     return redirect("/")
 
 
+@app.route("/equity")
+@login_required
+def equity():
+    """Exact equity of two or more hands over every runout of a partial board, e.g. /equity?hands=AHAD,KSKC&board=2C7D9H"""
+
+    try:
+        holdings = [evaluator.parse_cards(hand) for hand in request.args.get("hands", "").upper().split(",")]
+        board = evaluator.parse_cards(request.args.get("board", "").upper())
+    except KeyError:
+        return jsonify(error="Invalid card"), 400
+
+    error = check_deal(holdings, board)
+    if error:
+        return jsonify(error=error), 400
+
+    result = service_exact(holdings, board)
+    if result is None:
+        return jsonify(error="Busy, try again"), 503
+    return jsonify(result)
+
+
+@app.route("/log")
+@login_required
+def log():
+    """A window of the active game's log as JSON: entries after the id in ?after=, before the id in ?before=, or the latest"""
+
+    game = load_game(session["user_id"])
+    if game is None:
+        return jsonify(error="No active game"), 404
+
+    entries, more = log_entries(game['log_id'], request.args.get("after", type=int), request.args.get("before", type=int))
+    return jsonify(entries=entries, more=more)
+
+
 @app.route("/display")
 def display():
     """Display showdown"""
@@ -0,0 +1,111 @@
+"""Measures how many game actions per second the database can save, committing every statement versus one transaction in WAL mode
+
+Usage:
+    python bench_database.py [--actions 2000] [--entries 4] [--readers 2]
+
+Each action replays what saving a move writes: one update of the games row and a few log entries. The old way commits
+every statement on its own with SQLite's default rollback journal and full syncs; the new way is how helpers.py saves
+now, one transaction on a connection set up by database.connect_sqlite(). Reader processes meanwhile load the
+leaderboard and the active game in a loop, as other users' requests would. Both runs use copies of poker.db in a
+temporary directory, so the real database is never touched.
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from multiprocessing import Event, Process, Value
+
+from cs50 import SQL
+
+from database import DATABASE_PATH, connect_sqlite, open_database, transaction
+from engine import Engine
+from migrations import migrate
+
+
+"""Returns a CS50 SQL handle on a database copy with SQLite's defaults (rollback journal, full syncs)"""
+def open_default(path):
+
+    def connect():
+        connection = sqlite3.connect(path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode = DELETE")
+        return connection
+
+    return SQL("sqlite:///" + path, creator=connect)
+
+
+"""Loads the leaderboard and the active game until stop is set, counting the reads done"""
+def read_loop(path, wal, player_id, stop, reads):
+    connection = connect_sqlite(path) if wal else sqlite3.connect(path)
+    while not stop.is_set():
+        try:
+            connection.execute("SELECT * FROM users").fetchall()
+            connection.execute("SELECT * FROM games WHERE player_id = ? AND active = 1", (player_id,)).fetchall()
+        except sqlite3.OperationalError:
+            continue
+        with reads.get_lock():
+            reads.value += 1
+
+
+"""Saves actions moves to a new game and returns (actions per second, reads per second by the readers meanwhile)"""
+def run(db, path, wal, actions, entries, readers):
+
+    # A game for a throwaway user, with the columns a real move updates
+    user_id = db.execute("INSERT INTO users (username, password, wins, losses) VALUES (?, '', 0, 0)", "bench_" + str(time.time()))
+    row = Engine().new_game().to_row()
+    game_id = db.execute("INSERT INTO games (player_id, active, " + ", ".join(row) + ") VALUES (?, 1, " + ", ".join("?" for field in row) + ")", user_id, *row.values())
+    log_id = db.execute("INSERT INTO logs (game_id) VALUES (?)", game_id)
+
+    stop, reads = Event(), Value("i", 0)
+    processes = [Process(target=read_loop, args=(path, wal, user_id, stop, reads)) for _ in range(readers)]
+    for process in processes:
+        process.start()
+
+    update = "UPDATE games SET " + ", ".join(field + " = ?" for field in row) + " WHERE id = ?"
+    start = time.perf_counter()
+    for action in range(actions):
+        row["pot"] = action
+        if wal:
+            with transaction(db):
+                db.execute(update, *row.values(), game_id)
+                db.execute("INSERT INTO entries (entry, log_id) VALUES " + ", ".join("(?, ?)" for entry in range(entries)),
+                           *[value for entry in range(entries) for value in ("bench calls", log_id)])
+        else:
+            db.execute(update, *row.values(), game_id)
+            for entry in range(entries):
+                db.execute("INSERT INTO entries (entry, log_id) VALUES (?, ?)", "bench calls", log_id)
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    for process in processes:
+        process.join()
+    return actions / elapsed, reads.value / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Game-saving throughput with and without transactions and WAL mode")
+    parser.add_argument("--actions", type=int, default=2000)
+    parser.add_argument("--entries", type=int, default=4, help="log entries written per action")
+    parser.add_argument("--readers", type=int, default=2, help="processes reading while actions are saved")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        for name, wal in [("autocommit, rollback journal", False), ("one transaction, WAL", True)]:
+            path = os.path.join(directory, ("wal_" if wal else "default_") + os.path.basename(DATABASE_PATH))
+
+            # The backup API copies anything still in poker.db's write-ahead log too
+            with sqlite3.connect(DATABASE_PATH) as source, sqlite3.connect(path) as copy:
+                source.backup(copy)
+            db = open_database("sqlite:///" + path) if wal else open_default(path)
+            migrate(db, "sqlite:///" + path)
+            per_second, reads = run(db, path, wal, args.actions, args.entries, args.readers)
+            print("%-30s %8.0f actions/sec  %8.0f reads/sec alongside" % (name, per_second, reads))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
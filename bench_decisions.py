@@ -0,0 +1,99 @@
+"""Checks the batch bot decision against the scalar one and reports the speed of both
+
+Usage:
+    python bench_decisions.py [--states 20000] [--seed 0]
+
+engine.bot_decisions() decides for arrays of game states with one random draw each. For the BotConfig thresholds and,
+when strategy.json has been built, the solved strategy table, every random state is also decided one at a time by
+decide() with the same draw, and its action and raise size must match. Exits with status 1 on any mismatch.
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from engine import ACTION_NAMES, BotConfig, GameState, bot_decisions, bot_raise_size
+from strategy import STREETS, load_strategy
+
+
+class Draw:
+    """Stands in for an RNG whose random() returns one fixed draw"""
+
+    def __init__(self, draw):
+        self.draw = draw
+
+    def random(self):
+        return self.draw
+
+
+"""Returns a seeded batch of count random states as a dict of arrays, with the bot's stack and bet as opp_chips and opp_bet"""
+def random_states(count, seed):
+    rng = np.random.default_rng(seed)
+    return {
+        "hand_strength": rng.random(count),
+        "chips": rng.integers(0, 100, count),
+        "bet": rng.integers(0, 40, count),
+        "opp_chips": rng.integers(0, 100, count),
+        "opp_bet": rng.integers(0, 40, count),
+        "pot": rng.integers(0, 200, count),
+        "draws": rng.random(count),
+        "street": rng.choice(STREETS, count),
+        "position": rng.choice(["sb", "bb"], count),
+    }
+
+
+"""Returns the action name and raise size the scalar path picks for state i of a batch"""
+def scalar_decision(states, i, config):
+    state = GameState(chips=int(states["chips"][i]), opp_chips=int(states["opp_chips"][i]), pot=int(states["pot"][i]), position=str(states["position"][i]),
+                      street=str(states["street"][i]), bet=int(states["bet"][i]), opp_bet=int(states["opp_bet"][i]))
+    decision = config.decide(float(states["hand_strength"][i]), state, Draw(float(states["draws"][i])))
+    facing = state.bet > state.opp_bet
+    if decision == "raise":
+        return "raise", bot_raise_size(state)
+    if decision == "checkcall":
+        return ("call" if facing else "check"), 0
+    return ("fold" if facing else "check"), 0
+
+
+"""Decides a batch with bot_decisions and returns (mismatches against the scalar path, batch seconds, scalar seconds)"""
+def check_config(states, config):
+
+    start = time.perf_counter()
+    actions, sizes = bot_decisions(states["hand_strength"], states["chips"], states["bet"], states["opp_chips"], states["opp_bet"], states["pot"],
+                                   states["draws"], config, states["street"], states["position"])
+    batch_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    expected = [scalar_decision(states, i, config) for i in range(len(actions))]
+    scalar_seconds = time.perf_counter() - start
+
+    mismatches = sum(1 for i, (action, size) in enumerate(expected) if ACTION_NAMES[actions[i]] != action or sizes[i] != size)
+    return mismatches, batch_seconds, scalar_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch bot decisions checked against the scalar path")
+    parser.add_argument("--states", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    configs = [("BotConfig thresholds", BotConfig())]
+    strategy = load_strategy()
+    if strategy is not None:
+        configs.append(("strategy table", strategy))
+
+    failures = 0
+    states = random_states(args.states, args.seed)
+    for name, config in configs:
+        mismatches, batch_seconds, scalar_seconds = check_config(states, config)
+        failures += mismatches
+        print("%-22s %d states: %d mismatches  batch %10.0f states/sec  scalar %10.0f states/sec"
+              % (name, args.states, mismatches, args.states / batch_seconds, args.states / scalar_seconds))
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""Checks the hand evaluators against an independent reference ranking and reports their speed
+
+Usage:
+    python bench_evaluator.py [--hands 100000] [--seed 0] [--exhaustive]
+
+The reference ranks every 5-card subset of a hand with a plain counting classifier, so it shares no code or tables
+with evaluator.py or the legacy detectors in legacy_hands.py. Corpora are drawn from a fixed seed, so runs are comparable.
+Exits with status 1 if the table-driven evaluator disagrees with the reference or an edge case fails; legacy
+mismatches are reported but expected (it misses straight flushes and most wheels).
+"""
+
+import argparse
+import itertools
+import random
+import sys
+import time
+
+import numpy as np
+
+import evaluator
+from engine import Engine, GameState, estimate_strength
+from legacy_hands import bot_strength_legacy, compare_hands_legacy
+
+REFERENCE_RANKS = "23456789TJQKA"
+CATEGORY_NAMES = ["high card", "pair", "two pair", "trips", "straight", "flush", "full house", "quads", "straight flush"]
+
+# Number of 5-card hands in each category (high card first), and the number of distinct 5-card hand values
+CATEGORY_COUNTS = [1302540, 1098240, 123552, 54912, 10200, 5108, 3744, 624, 40]
+DISTINCT_VALUES = 7462
+
+# Spots timed with the legacy bot_strength, which takes about a tenth of a second each
+LEGACY_SPOTS = 10
+
+# (name, first hand, second hand, board, expected compare() result: 0 first wins, 1 second wins, 2 chop)
+EDGE_CASES = [
+    ("two sets of trips make a full house", "KHKD", "AHQD", "KSQSQC2D7H", 0),
+    ("higher of two trips is used", "QHQD", "KHKD", "KSQSKC2D3H", 1),
+    ("two trips beat a straight", "9H9D", "JHTD", "9S8S8C8D2H", 0),
+    ("wheel straight", "AH2D", "KHKD", "3S4C5DKS9H", 0),
+    ("wheel loses to a six-high straight", "AH2D", "6H2C", "3S4C5DKS9H", 1),
+    ("steel wheel beats quads", "AS2S", "9H9D", "3S4S5S9S9C", 0),
+    ("straight with paired ranks", "8H8D", "AHKD", "9C7S6D5H5S", 0),
+    ("higher straight through a paired board", "TH8D", "8C4C", "7C6S5D5H9S", 0),
+    ("board plays for a chop", "2H3D", "4C2D", "AHKHQDJSTS", 2),
+    ("counterfeited two pair chops", "2H2D", "3H3D", "AHASKDKSQC", 2),
+    ("flush beats straight", "2H7H", "JSTD", "9H8H6C5HQD", 0),
+    ("kicker decides one pair", "AHKD", "AD9C", "AS7C5D3H2S", 0),
+    ("sixth card doesn't play", "AH2D", "AD3C", "ASKCQDJH9S", 2),
+]
+
+
+"""Returns the reference value of five card strings as a tuple that sorts weakest to strongest"""
+def reference_five(cards):
+    ranks = sorted((REFERENCE_RANKS.index(card[0]) for card in cards), reverse=True)
+    flush = len({card[1] for card in cards}) == 1
+    groups = sorted(((ranks.count(rank), rank) for rank in set(ranks)), reverse=True)
+    grouped = [rank for count, rank in groups]
+
+    straight_high = None
+    if len(groups) == 5:
+        if ranks[0] - ranks[4] == 4:
+            straight_high = ranks[0]
+        elif ranks == [12, 3, 2, 1, 0]:
+            straight_high = 3
+
+    if straight_high is not None and flush:
+        return (8, straight_high)
+    if groups[0][0] == 4:
+        return (7,) + tuple(grouped)
+    if groups[0][0] == 3 and groups[1][0] == 2:
+        return (6,) + tuple(grouped)
+    if flush:
+        return (5,) + tuple(ranks)
+    if straight_high is not None:
+        return (4, straight_high)
+    if groups[0][0] == 3:
+        return (3,) + tuple(grouped)
+    if groups[0][0] == 2 and groups[1][0] == 2:
+        return (2,) + tuple(grouped)
+    if groups[0][0] == 2:
+        return (1,) + tuple(grouped)
+    return (0,) + tuple(ranks)
+
+
+"""Returns the reference value of 5 to 7 card strings, the best of its 5-card subsets"""
+def reference_rank(cards):
+    return max(reference_five(five) for five in itertools.combinations(cards, 5))
+
+
+"""Returns the sign of a comparison: -1, 0 or 1"""
+def sign(a, b):
+    return (a > b) - (a < b)
+
+
+"""Returns a seeded corpus of count random sets of size distinct card strings"""
+def corpus(count, seed, size=7):
+    rng = random.Random(seed)
+    deck = [rank + suit for rank in REFERENCE_RANKS for suit in evaluator.SUITS]
+    return [rng.sample(deck, size) for _ in range(count)]
+
+
+"""Returns the number of hands whose category or relative order under the evaluator differs from the reference"""
+def check_evaluator(hands):
+
+    values = [evaluator.evaluate("".join(hand)) for hand in hands]
+    references = [reference_rank(hand) for hand in hands]
+
+    mismatches = sum(1 for value, reference in zip(values, references) if value >> 20 != reference[0])
+
+    # Sorting by one ranking and checking neighbours is enough to show both rankings order and tie the corpus the same way
+    order = sorted(range(len(hands)), key=lambda i: values[i])
+    for i, j in zip(order, order[1:]):
+        if sign(values[i], values[j]) != sign(references[i], references[j]):
+            mismatches += 1
+    return mismatches
+
+
+"""Returns {reference category of the winning hand: mismatches} for a comparison function over head-to-head deals"""
+def check_comparison(compare, hands):
+    mismatches = {}
+    for cards in hands:
+        hand1, hand2, board = "".join(cards[0:2]), "".join(cards[2:4]), "".join(cards[4:9])
+        reference1, reference2 = reference_rank(cards[0:2] + cards[4:9]), reference_rank(cards[2:4] + cards[4:9])
+        expected = {1: 0, -1: 1, 0: 2}[sign(reference1, reference2)]
+        if compare(hand1, hand2, board) != expected:
+            category = max(reference1, reference2)[0]
+            mismatches[category] = mismatches.get(category, 0) + 1
+    return mismatches
+
+
+"""Ranks all 2,598,960 5-card hands in batches and returns (per-category counts, number of distinct values)"""
+def exhaustive_counts():
+    counts = np.zeros(9, dtype=np.int64)
+    distinct = set()
+    combos = itertools.combinations(range(52), 5)
+    while True:
+        batch = np.array(list(itertools.islice(combos, 200000)), dtype=np.int64)
+        if len(batch) == 0:
+            break
+        values = evaluator.rank_many(batch)
+        counts += np.bincount(values >> 20, minlength=9)
+        distinct.update(np.unique(values).tolist())
+    return counts.tolist(), len(distinct)
+
+
+"""Runs the chop at showdown through the engine and returns True if each stack gets half the pot"""
+def check_showdown_chop():
+    state = GameState(chips=90, opp_chips=90, pot=20, street="river", hand="2H3D", opp_hand="4C2D", board="AHKHQDJSTS", bet=0, opp_bet=0)
+    Engine().showdown(state)
+    return state.chips == 100 and state.opp_chips == 100
+
+
+"""Returns the average seconds per call of fn over the given argument tuples"""
+def time_calls(fn, arguments):
+    start = time.perf_counter()
+    for args in arguments:
+        fn(*args)
+    return (time.perf_counter() - start) / len(arguments)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluator correctness checks and benchmarks")
+    parser.add_argument("--hands", type=int, default=100000, help="random 7-card hands in the cross-check and benchmarks")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--exhaustive", action="store_true", help="also rank every 5-card hand")
+    args = parser.parse_args()
+
+    failures = 0
+    hands = corpus(args.hands, args.seed)
+    deals = corpus(args.hands // 10, args.seed + 1, 9)
+
+    print("Edge cases:")
+    for name, hand1, hand2, board, expected in EDGE_CASES:
+        result, legacy = evaluator.compare(hand1, hand2, board), compare_hands_legacy(hand1, hand2, board)
+        failures += result != expected
+        print("  %-50s evaluator %s  legacy %s" % (name, "ok" if result == expected else "FAIL", "ok" if legacy == expected else "wrong"))
+    chop = check_showdown_chop()
+    failures += not chop
+    print("  %-50s engine %s" % ("showdown chop splits the pot", "ok" if chop else "FAIL"))
+
+    mismatches = check_evaluator(hands)
+    failures += mismatches
+    print("Evaluator vs reference on %d hands: %d mismatches" % (len(hands), mismatches))
+
+    comparison = check_comparison(evaluator.compare, deals)
+    failures += sum(comparison.values())
+    print("compare() vs reference on %d deals: %d mismatches" % (len(deals), sum(comparison.values())))
+
+    legacy = check_comparison(compare_hands_legacy, deals)
+    print("Legacy compare_hands vs reference on %d deals: %d mismatches %s" % (len(deals), sum(legacy.values()),
+          {CATEGORY_NAMES[category]: count for category, count in sorted(legacy.items())}))
+
+    if args.exhaustive:
+        counts, distinct = exhaustive_counts()
+        ok = counts == CATEGORY_COUNTS and distinct == DISTINCT_VALUES
+        failures += not ok
+        print("All 5-card hands: categories %s, %d distinct values %s" % (counts, distinct, "ok" if ok else "FAIL"))
+
+    # Speed on the same seeded corpora
+    card_ints = [evaluator.parse_cards("".join(hand)) for hand in hands]
+    strings = [("".join(hand[:2]), "".join(hand[2:])) for hand in hands]
+    triples = [("".join(deal[0:2]), "".join(deal[2:4]), "".join(deal[4:9])) for deal in deals]
+    print("Speed:")
+    print("  evaluator.hand_rank     %10.0f hands/sec" % (1 / time_calls(evaluator.hand_rank, [(cards,) for cards in card_ints])))
+    print("  evaluator.evaluate      %10.0f hands/sec" % (1 / time_calls(evaluator.evaluate, strings)))
+    start = time.perf_counter()
+    evaluator.rank_many(np.array(card_ints, dtype=np.int64))
+    print("  evaluator.rank_many     %10.0f hands/sec" % (len(card_ints) / (time.perf_counter() - start)))
+    print("  evaluator.compare       %10.0f hands/sec" % (2 / time_calls(evaluator.compare, triples)))
+    print("  legacy compare_hands    %10.0f hands/sec" % (2 / time_calls(compare_hands_legacy, triples)))
+    print("  reference (21 subsets)  %10.0f hands/sec" % (1 / time_calls(reference_rank, [(hand,) for hand in hands[:10000]])))
+
+    # Bot strength without caching, one seeded spot per street, against the original enumeration of every player
+    # holding through compare_hands_legacy, which always ranked the full board (so costs the same on every street)
+    print("bot_strength latency (uncached):")
+    legacy_spots = [(triple[1], triple[2]) for triple in triples[:LEGACY_SPOTS]]
+    legacy_ms = 1000 * time_calls(bot_strength_legacy, legacy_spots)
+    for street in ["preflop", "flop", "turn", "river"]:
+        spots = [(triple[1], triple[2], street) for triple in triples[:200]]
+        print("  %-8s %8.2f ms   legacy %8.2f ms" % (street, 1000 * time_calls(estimate_strength, spots), legacy_ms))
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+"""Generates preflop_equity.json, the preflop equity table loaded by preflop.py
+
+Run once after changing the evaluator or the common ranges:
+    python build_preflop.py [samples per entry]
+"""
+
+import sys
+
+import preflop
+
+
+if __name__ == "__main__":
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    preflop.write_table(samples)
+    print("Wrote " + preflop.TABLE_PATH)
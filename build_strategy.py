@@ -0,0 +1,16 @@
+"""Generates strategy.json, the bot's strategy table loaded by strategy.py
+
+Run once after changing the abstraction, the evaluator or the preflop table:
+    python build_strategy.py [samples per street] [CFR iterations]
+"""
+
+import sys
+
+import strategy
+
+
+if __name__ == "__main__":
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 4000
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    strategy.write_strategy(samples, iterations)
+    print("Wrote " + strategy.STRATEGY_PATH)
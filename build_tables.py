@@ -0,0 +1,12 @@
+"""Generates hand_ranks.bin, the precomputed rank tables memory-mapped by evaluator.py
+
+Run once after changing the evaluator's rank encoding (and bumping evaluator.TABLES_VERSION):
+    python build_tables.py
+"""
+
+import evaluator
+
+
+if __name__ == "__main__":
+    evaluator.write_tables()
+    print("Wrote " + evaluator.TABLES_PATH)
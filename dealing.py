@@ -0,0 +1,67 @@
+"""Seedable dealing from an integer deck, so any hand can be re-dealt exactly from its stored seed
+
+Usage:
+    python dealing.py <seed>
+"""
+
+import random
+import sys
+
+import numpy as np
+
+import evaluator
+
+# Cards are evaluator integers (rank * 4 + suit)
+DECK = list(range(52))
+
+# Two hole cards for each player plus five board cards
+DEAL_SIZE = 9
+
+# Seeds fit in a signed 64-bit SQLite INTEGER
+SEED_BITS = 63
+
+
+"""Returns a new seed for one hand's RNG stream"""
+def new_seed(rng=random):
+    return rng.getrandbits(SEED_BITS)
+
+
+"""Returns the first count cards of a shuffled deck, using a partial Fisher-Yates shuffle seeded by seed"""
+def deal_cards(seed, count=DEAL_SIZE):
+    rng = random.Random(seed)
+    deck = DECK[:]
+
+    # Only the first count positions are shuffled, one swap each
+    for i in range(count):
+        j = i + int(rng.random() * (52 - i))
+        deck[i], deck[j] = deck[j], deck[i]
+
+    return deck[:count]
+
+
+"""Returns the hands and board dealt by a seed as card strings, in the same form as the games table"""
+def deal(seed):
+    cards = [evaluator.int_to_card(card) for card in deal_cards(seed)]
+    return {"hand": "".join(cards[0:2]), "opp_hand": "".join(cards[2:4]), "board": "".join(cards[4:9])}
+
+
+"""Returns an (n, count) int8 array of n independent deals, using one vectorized partial Fisher-Yates shuffle"""
+def deal_batch(n, rng=None, count=DEAL_SIZE):
+
+    rng = np.random.default_rng() if rng is None else rng
+    decks = np.tile(np.arange(52, dtype=np.int8), (n, 1))
+    rows = np.arange(n)
+
+    # Swaps column i of every deck with a random column from i onwards
+    for i in range(count):
+        j = rng.integers(i, 52, n)
+        picked = decks[rows, j]
+        decks[rows, j] = decks[:, i]
+        decks[:, i] = picked
+
+    return decks[:, :count]
+
+
+if __name__ == "__main__":
+    for key, value in deal(int(sys.argv[1])).items():
+        print(key + ": " + value)
@@ -0,0 +1,605 @@
+"""In-memory heads-up game engine, independent of the database and the web layer"""
+
+import random
+
+import numpy as np
+
+import evaluator
+from dealing import deal, new_seed
+from equity import estimate_equity, exact_equity, visible_board
+from equity_cache import canonical_key
+from opponent_range import OpponentRange
+from preflop import preflop_equity, preflop_range_equity
+
+# Columns of the games table that make up a game's state
+STATE_FIELDS = ["chips", "opp_chips", "pot", "position", "street", "hand", "opp_hand", "board", "bet", "opp_bet", "displayed", "strength", "strength_key", "seed", "opp_range"]
+
+NEXT_STREET = {"preflop": "flop", "flop": "turn", "turn": "river"}
+
+
+"""Returns estimate_equity()'s result for integer cards against the given holdings (every holding if None) with its default sample budget"""
+def default_estimate(hand, board, opponent_range=None, opponent_weights=None):
+    return estimate_equity(hand, board, opponent_range=opponent_range, opponent_weights=opponent_weights)
+
+
+"""Returns the range bucket the bot's strength is cached under (see OpponentRange.bucket), or None while the user's range is untouched"""
+def range_bucket(opp_hand, board, street, opp_range):
+    if opp_range is None or opp_range.is_uniform():
+        return None
+    return opp_range.bucket(evaluator.parse_cards(visible_board(board, street)), evaluator.parse_cards(opp_hand))
+
+
+"""Returns the bot's equity with the given hand on the visible part of the board, against the user's range once their actions have narrowed it.
+estimate(hand, board, opponent_range, opponent_weights) is estimate_equity() or a stand-in returning its result (with "fallback" set for a result
+that mustn't be cached), and cache is an equity_cache.EquityCache or None"""
+def estimate_strength(opp_hand, board, street, opp_range=None, estimate=default_estimate, cache=None):
+
+    opp_cards = evaluator.parse_cards(opp_hand)
+    board_cards = evaluator.parse_cards(visible_board(board, street))
+    bucket = range_bucket(opp_hand, board, street, opp_range)
+
+    # Preflop equity is a lookup in the precomputed table when it has been built; against a narrowed range, the table's
+    # equities against the top 10% to 50% of hands are interpolated at the top fraction as strong on average as the range
+    if street == "preflop":
+        if bucket is None:
+            hand_strength = preflop_equity(opp_cards)
+        else:
+            hand_strength = preflop_range_equity(opp_cards, opp_range.preflop_fraction(opp_cards))
+        if hand_strength is not None:
+            return hand_strength
+
+    # Other estimates are cached by suit-isomorphic spot and, once the range is narrowed, its bucket, so ranges of about
+    # the same strength on equivalent boards share one estimate
+    key = canonical_key(opp_cards, board_cards) + ("" if bucket is None else "@" + str(bucket))
+    hand_strength = cache.get(key) if cache is not None else None
+    if hand_strength is None:
+        combos = weights = None
+        if bucket is not None:
+            combos, weights = opp_range.holdings(opp_cards + board_cards)
+        result = estimate(opp_cards, board_cards, combos, weights)
+        hand_strength = result['equity']
+
+        # Only full-budget estimates are cached, not timeout fallbacks
+        if cache is not None and not result.get('fallback'):
+            cache.put(key, hand_strength)
+
+    return hand_strength
+
+
+class InvalidAction(Exception):
+    """Raised by Engine.step for a move the rules don't allow, with the message to show the player"""
+
+
+class BotConfig:
+    """Thresholds and mixing frequencies for the bot's decisions"""
+
+    def __init__(self, raise_at=0.9, mixed_at=0.7, call_at=0.4, mix=0.5, bluff=0.2):
+        self.raise_at = raise_at
+        self.mixed_at = mixed_at
+        self.call_at = call_at
+        self.mix = mix
+        self.bluff = bluff
+
+    def decide(self, hand_strength, state, rng=random):
+        """Returns the bot's choice for a state using these thresholds (see bot_decision)"""
+
+        return bot_decision(hand_strength, state, self, rng)
+
+    def decide_many(self, hand_strength, chips, bet, opp_chips, opp_bet, draws, street=None, position=None):
+        """Returns (raises, checkcalls) boolean arrays for many games at once, with one draw per game (see bot_decisions)"""
+
+        # Same branches as bot_decision, where True means raise for strong hands and check/call for moderate ones
+        can_raise = (chips != 0) & (bet < opp_chips + opp_bet)
+        very_strong = hand_strength >= self.raise_at
+        strong = ~very_strong & (hand_strength >= self.mixed_at)
+        moderate = ~very_strong & ~strong & (hand_strength >= self.call_at)
+        weak = ~very_strong & ~strong & ~moderate
+
+        raises = can_raise & (very_strong | (strong & (draws >= self.mix)) | (weak & (draws < self.bluff)))
+        checkcalls = ~raises & (very_strong | strong | (moderate & (draws < self.mix)))
+        return raises, checkcalls
+
+    def __repr__(self):
+        return "BotConfig(" + ", ".join(str(value) for value in [self.raise_at, self.mixed_at, self.call_at, self.mix, self.bluff]) + ")"
+
+
+"""Returns the bot's choice ("raise", "checkcall" or "checkfold"), where state.chips and state.bet belong to the bot's opponent"""
+def bot_decision(hand_strength, state, config, rng=random):
+
+    # Raising is pointless if the opponent is all in or already putting the bot all in
+    can_raise = state.chips != 0 and state.bet < state.opp_chips + state.opp_bet
+
+    # Choose action based on strength of hand
+    if hand_strength >= config.raise_at:
+
+        # Very strong hands always raise when they can
+        return "raise" if can_raise else "checkcall"
+
+    elif hand_strength >= config.mixed_at:
+
+        # Strong hands check/call some of the time (config.mix) and raise the rest
+        if rng.random() < config.mix or not can_raise:
+            return "checkcall"
+        return "raise"
+
+    elif hand_strength >= config.call_at:
+
+        # Moderate hands check/call some of the time and check/fold the rest
+        if rng.random() < config.mix:
+            return "checkcall"
+        return "checkfold"
+
+    # Weak hands bluff some of the time (config.bluff) and check/fold the rest
+    if rng.random() < config.bluff and can_raise:
+        return "raise"
+    return "checkfold"
+
+
+"""Returns the size the bot raises to, where state.chips and state.bet belong to the bot's opponent"""
+def bot_raise_size(state):
+
+    # If facing a raise, reraise to twice the opponent's bet. If opening, raise to half pot.
+    if state.bet > 0:
+        raise_size = state.bet * 2
+    else:
+        raise_size = round(state.pot * 0.5)
+
+    # If raise size is larger than the opponent's stack, adjust it to put them exactly all in
+    if raise_size > state.chips + state.bet:
+        raise_size = state.chips + state.bet
+
+    # If raise size is larger than bot's stack, adjust it to put the bot all in
+    if raise_size > state.opp_chips + state.opp_bet:
+        raise_size = state.opp_chips + state.opp_bet
+
+    return raise_size
+
+
+# Codes returned by bot_decisions for each state
+CHECK, CALL, FOLD, RAISE = 0, 1, 2, 3
+ACTION_NAMES = ["check", "call", "fold", "raise"]
+
+
+"""Decides for many bots at once; each argument is an array with one entry per game (chips and bet belong to each bot's opponent)
+
+config is a BotConfig or a strategy.Strategy (the default is the BotConfig thresholds, not the table the app's bot plays);
+a Strategy also needs each game's street and position (the player's, as in GameState). draws holds one uniform random
+number in [0, 1) per game, used where BotConfig.decide() or Strategy.decide() would call rng.random(), and with the same
+draws the results match theirs (bench_decisions.py checks this).
+Returns (actions, raise_sizes): action codes (CHECK, CALL, FOLD or RAISE) and the size each raising bot raises to (0 otherwise).
+"""
+def bot_decisions(hand_strength, chips, bet, opp_chips, opp_bet, pot, draws, config=None, street=None, position=None):
+
+    config = BotConfig() if config is None else config
+    hand_strength, draws = np.asarray(hand_strength, dtype=float), np.asarray(draws, dtype=float)
+    chips, bet, opp_chips, opp_bet, pot = [np.asarray(values, dtype=np.int64) for values in (chips, bet, opp_chips, opp_bet, pot)]
+    raises, checkcalls = config.decide_many(hand_strength, chips, bet, opp_chips, opp_bet, draws, street, position)
+
+    # Check/call calls and check/fold folds only when facing a raise
+    facing = bet > opp_bet
+    actions = np.full(len(hand_strength), CHECK, dtype=np.int64)
+    actions[checkcalls & facing] = CALL
+    actions[~raises & ~checkcalls & facing] = FOLD
+    actions[raises] = RAISE
+
+    # Same sizing as bot_raise_size: twice the opponent's bet or half the pot, capped by both stacks
+    sizes = np.where(bet > 0, bet * 2, np.round(pot * 0.5).astype(np.int64))
+    sizes = np.minimum(sizes, chips + bet)
+    sizes = np.minimum(sizes, opp_chips + opp_bet)
+
+    return actions, np.where(raises, sizes, 0)
+
+
+class GameState:
+    """One game's chips, bets, cards and position (the player's side first, "opp" is the bot), plus log entries not yet saved"""
+
+    def __init__(self, chips=99, opp_chips=98, pot=0, position="sb", street="preflop", hand="", opp_hand="", board="", bet=1, opp_bet=2, displayed=0, strength=None, strength_key=None, seed=None, opp_range=None):
+        self.chips = chips
+        self.opp_chips = opp_chips
+        self.pot = pot
+        self.position = position
+        self.street = street
+        self.hand = hand
+        self.opp_hand = opp_hand
+        self.board = board
+        self.bet = bet
+        self.opp_bet = opp_bet
+        self.displayed = displayed
+        self.strength = strength
+        self.strength_key = strength_key
+        self.seed = seed
+        self.opp_range = opp_range
+        self.log = []
+
+        # Seeds of hands dealt since the state was last saved, in order, so each hand's cards can be replayed from the log
+        self.dealt = []
+
+    @classmethod
+    def from_row(cls, row):
+        """Builds a state from a games row"""
+
+        state = cls(**{field: row[field] for field in STATE_FIELDS})
+        if state.opp_range is not None:
+            state.opp_range = OpponentRange.from_blob(state.opp_range)
+        return state
+
+    def to_row(self):
+        """Returns the state as a dictionary of games columns"""
+
+        row = {field: getattr(self, field) for field in STATE_FIELDS}
+        if self.opp_range is not None:
+            row["opp_range"] = self.opp_range.to_blob()
+        return row
+
+    def mirrored(self):
+        """Returns a copy seen from the bot's seat, so the player's side can be decided like the bot's"""
+
+        return GameState(self.opp_chips, self.chips, self.pot, "bb" if self.position == "sb" else "sb", self.street, self.opp_hand, self.hand, self.board, self.opp_bet, self.bet, self.displayed)
+
+
+class Engine:
+    """Applies the rules of heads-up no limit hold'em (1/2 blinds) to a GameState, including the bot's responses"""
+
+    def __init__(self, username="Player", strength=estimate_strength, rng=random, bot=None, allin_equity=exact_equity):
+        self.username = username
+        self.strength = strength
+        self.rng = rng
+        self.bot = BotConfig() if bot is None else bot
+        self.allin_equity = allin_equity
+
+    def new_game(self):
+        """Returns a new game with the player in the small blind"""
+
+        seed = new_seed(self.rng)
+        hand_info = deal(seed)
+        state = GameState(hand=hand_info['hand'], opp_hand=hand_info['opp_hand'], board=hand_info['board'], seed=seed, opp_range=OpponentRange())
+        state.dealt.append(seed)
+        state.log.append("Preflop:")
+        return state
+
+    def winner(self, state):
+        """Returns 0 if neither player has won, 1 if the player has won, 2 if the bot has won"""
+
+        if state.chips == 0:
+            return 2
+        if state.opp_chips == 0:
+            return 1
+        return 0
+
+    def next_hand(self, state):
+        """Starts the hand after a showdown, returning "showdown" if it was run out at once and "continue" otherwise"""
+
+        state.displayed = 0
+        return self.start_hand(state)
+
+    def step(self, state, action, raise_size=None):
+        """Applies the player's action (call, raise, check or fold) and the bot's responses, returning showdown or continue"""
+
+        if action == "call":
+            return self.call(state)
+        if action == "raise":
+            return self.raise_to(state, raise_size)
+        if action == "check":
+            return self.check(state)
+        if action == "fold":
+            return self.fold(state)
+        return "continue"
+
+    def call(self, state):
+        """Player calls the bot's bet"""
+
+        # Checks for invalid calls
+        if state.bet >= state.opp_bet:
+            raise InvalidAction("Invalid Call")
+
+        # A user who can't cover the bet calls with the rest of their stack, and the bot takes back what wasn't called
+        if state.opp_bet - state.bet > state.chips:
+            state.opp_chips += state.opp_bet - state.bet - state.chips
+            state.opp_bet = state.bet + state.chips
+
+        # Updates user's chips and bet
+        state.chips = state.chips - state.opp_bet + state.bet
+        state.bet = state.opp_bet
+        state.log.append(self.username + " calls")
+        self.observe(state, "call")
+
+        # If the call puts the user all in, go to showdown
+        if self.all_in(state):
+            return self.run_out(state)
+
+        # If it is preflop and player is calling the big blind, the bot can still move
+        elif state.street == "preflop" and state.opp_bet == 2:
+            bot_move = self.bot_action(state)
+            # If bot checks, ends action and goes to next street, where if player is in the small blind, the bot acts again.
+            if bot_move == "Opponent checks":
+                self.next_street(state)
+                if state.position == "sb":
+                    self.bot_action(state)
+
+        # When the call ends action, go to the next street. If the player is in the small blind, the bot acts first.
+        elif state.street != "river":
+            self.next_street(state)
+            if state.position == "sb":
+                self.bot_action(state)
+
+        # When the call ends action on the river, go to showdown
+        else:
+            return self.showdown(state)
+
+        return "continue"
+
+    def raise_to(self, state, raise_size):
+        """Player raises to raise_size"""
+
+        # Checks for invalid raises
+        if raise_size is None:
+            raise InvalidAction("Must enter raise size")
+        if (state.bet < state.opp_bet and raise_size < state.opp_bet + 2 and raise_size != state.chips) or raise_size < 2 or raise_size <= state.bet:
+            raise InvalidAction("Invalid raise size (must min raise)")
+        if raise_size > state.chips + state.bet:
+            raise InvalidAction("Not enough chips")
+
+        # If raise size is larger than bot's stack, adjust so it is exactly all in
+        if raise_size > state.opp_chips + state.opp_bet:
+            raise_size = state.opp_chips + state.opp_bet
+
+        # Updates user's stack and bet size
+        state.chips = state.chips - raise_size + state.bet
+        state.bet = raise_size
+        state.log.append(self.username + " raises to " + str(raise_size))
+        self.observe(state, "raise")
+
+        # Saves the pot for the log entry if the bot folds
+        pot = state.bet + state.opp_bet + state.pot
+
+        bot_move = self.bot_action(state)
+
+        if bot_move == "Opponent folds":
+
+            # Logs user winning pot, then starts the next hand
+            state.log.append(self.username + " wins pot of " + str(pot))
+            return self.start_hand(state)
+
+        if bot_move == "Opponent calls":
+
+            # If bot calls all in, go to showdown
+            if self.all_in(state):
+                return self.run_out(state)
+
+            # If bot calls and it's not the river, advance to next street. If user is in the small blind, let the bot act first
+            elif state.street != "river":
+                self.next_street(state)
+                if state.position == "sb":
+                    self.bot_action(state)
+
+            # Otherwise, bot call ends action on the river and goes to showdown
+            else:
+                return self.showdown(state)
+
+        return "continue"
+
+    def check(self, state):
+        """Player checks"""
+
+        # Checks for invalid checks
+        if state.bet != state.opp_bet:
+            raise InvalidAction("Invalid check")
+
+        state.log.append(self.username + " checks")
+        self.observe(state, "check")
+
+        # If the user is in the small blind, check ends action
+        if state.position == "sb":
+            if state.street != "river":
+                self.next_street(state)
+                self.bot_action(state)
+            else:
+                return self.showdown(state)
+
+        # If not preflop and in the big blind, check gives next move to the bot, and a bot check ends action
+        elif state.street != "preflop":
+            bot_move = self.bot_action(state)
+            if bot_move == "Opponent checks":
+                if state.street != "river":
+                    self.next_street(state)
+                else:
+                    return self.showdown(state)
+
+        # If preflop and in the big blind, check ends action and goes to next street
+        else:
+            self.next_street(state)
+
+        return "continue"
+
+    def fold(self, state):
+        """Player folds"""
+
+        # Checks for invalid folds
+        if state.bet == state.opp_bet:
+            raise InvalidAction("Invalid fold")
+
+        # Gives pot and bets to opp stack and logs it
+        pot = state.bet + state.opp_bet + state.pot
+        state.opp_chips += pot
+        state.log.append(self.username + " folds")
+        state.log.append("Opponent wins pot of " + str(pot))
+
+        # Clears pot and bets, then starts the next hand
+        state.pot = state.bet = state.opp_bet = 0
+        return self.start_hand(state)
+
+    def start_hand(self, state):
+        """Deals the next hand, where the bot moves first if the user is in the big blind and a blind that puts a player all in is run out"""
+
+        # A fold that leaves a player without chips ends the game, which is shown like a showdown
+        if self.winner(state):
+            state.displayed = 1
+            return "showdown"
+
+        self.reset(state)
+        blinds_all_in = self.all_in(state) and state.bet == state.opp_bet
+
+        # If the bot folds its small blind, logs the user winning the blinds and deals again
+        if state.position == "bb" and not blinds_all_in:
+            pot = state.bet + state.opp_bet
+            if self.bot_action(state) == "Opponent folds":
+                state.log.append(self.username + " wins pot of " + str(pot))
+                return self.start_hand(state)
+
+        if self.all_in(state) and state.bet == state.opp_bet:
+            return self.run_out(state)
+
+        return "continue"
+
+    def run_out(self, state):
+        """Deals the rest of the board once a player is all in and goes to showdown, first logging each player's exact equity if there is time"""
+
+        # allin_equity is exact_equity() or a stand-in for it that returns None when it can't answer in time, which skips the entry
+        if self.allin_equity is not None and state.street != "river":
+            board = evaluator.parse_cards(visible_board(state.board, state.street))
+            result = self.allin_equity([evaluator.parse_cards(state.hand), evaluator.parse_cards(state.opp_hand)], board)
+            if result is not None:
+                equity = result['equity']
+                state.log.append("All in: %s %.1f%%, Opponent %.1f%%" % (self.username, 100 * equity[0], 100 * equity[1]))
+
+        while state.street != "river":
+            self.next_street(state)
+        return self.showdown(state)
+
+    def reset(self, state):
+        """Resets board and hands to preflop"""
+
+        # Sets street to preflop, deals new hands and board from a new seed and clears the pot
+        state.seed = new_seed(self.rng)
+        state.dealt.append(state.seed)
+        hand_info = deal(state.seed)
+        state.opp_range = OpponentRange()
+        state.street = "preflop"
+        state.hand = hand_info['hand']
+        state.opp_hand = hand_info['opp_hand']
+        state.board = hand_info['board']
+        state.pot = 0
+
+        # Changes position and inputs blinds, where a player who can't cover their blind posts the rest of their stack
+        if state.position == "sb":
+            state.position = "bb"
+            state.bet, state.opp_bet = min(2, state.chips), min(1, state.opp_chips)
+        else:
+            state.position = "sb"
+            state.bet, state.opp_bet = min(1, state.chips), min(2, state.opp_chips)
+        state.chips -= state.bet
+        state.opp_chips -= state.opp_bet
+
+        # Logs the beginning of preflop
+        state.log.append("Preflop:")
+
+    def next_street(self, state):
+        """Updates betting street"""
+
+        # Move bets into the pot
+        state.pot += state.bet + state.opp_bet
+        state.bet = state.opp_bet = 0
+
+        # Updates street to next street and logs it
+        if state.street in NEXT_STREET:
+            state.street = NEXT_STREET[state.street]
+            state.log.append(state.street.capitalize() + ":")
+
+    def showdown(self, state):
+        """Showdown updates"""
+
+        # Ranks both hands to find the winner of showdown
+        rank = evaluator.evaluate(state.hand, state.board)
+        opp_rank = evaluator.evaluate(state.opp_hand, state.board)
+        pot = state.bet + state.opp_bet + state.pot
+
+        # Player wins
+        if rank > opp_rank:
+            state.chips += pot
+            state.log.append(self.username + " wins pot of " + str(pot) + " with " + evaluator.describe(rank))
+
+        # Bot wins
+        elif opp_rank > rank:
+            state.opp_chips += pot
+            state.log.append("Opponent wins pot of " + str(pot) + " with " + evaluator.describe(opp_rank))
+
+        # Chop pot
+        else:
+            half_pot = round(pot / 2)
+            state.chips += half_pot
+            state.opp_chips += pot - half_pot
+            state.log.append("Chop pot of " + str(pot) + " with " + evaluator.describe(rank))
+
+        state.displayed = 1
+        return "showdown"
+
+    def all_in(self, state):
+        """Returns True if either player is all in"""
+
+        return state.chips == 0 or state.opp_chips == 0
+
+    def observe(self, state, action):
+        """Narrows the user's range after they check, call or raise on the current street"""
+
+        if state.opp_range is not None:
+            state.opp_range.update(action, evaluator.parse_cards(visible_board(state.board, state.street)), evaluator.parse_cards(state.opp_hand))
+
+    def bot_strength(self, state):
+        """Returns bot's hand strength, reusing the stored value until the hand, street or bucket of the user's range changes"""
+
+        strength_key = state.opp_hand + state.board + state.street
+        bucket = range_bucket(state.opp_hand, state.board, state.street, state.opp_range)
+        if bucket is not None:
+            strength_key += "@" + str(bucket)
+        if state.strength_key != strength_key:
+            state.strength = self.strength(state.opp_hand, state.board, state.street, state.opp_range)
+            state.strength_key = strength_key
+        return state.strength
+
+    def bot_action(self, state):
+        """Bot decision-making, returning and logging the bot's move"""
+
+        decision = self.bot.decide(self.bot_strength(state), state, self.rng)
+        if decision == "raise":
+            bot_move = self.bot_raise(state)
+        elif decision == "checkcall":
+            bot_move = self.bot_checkcall(state)
+        else:
+            bot_move = self.bot_checkfold(state)
+
+        state.log.append(bot_move)
+        return bot_move
+
+    def bot_checkcall(self, state):
+        """Bot check/call"""
+
+        # If facing a raise, call (with the rest of the bot's stack if it can't cover it, the user taking back what wasn't called). If not, check.
+        if state.bet > state.opp_bet:
+            if state.bet - state.opp_bet > state.opp_chips:
+                state.chips += state.bet - state.opp_bet - state.opp_chips
+                state.bet = state.opp_bet + state.opp_chips
+            state.opp_chips = state.opp_chips - state.bet + state.opp_bet
+            state.opp_bet = state.bet
+            return "Opponent calls"
+
+        return "Opponent checks"
+
+    def bot_raise(self, state):
+        """Bot raise"""
+
+        # Updates bot's chips and bet size
+        raise_size = bot_raise_size(state)
+        state.opp_chips = state.opp_chips - raise_size + state.opp_bet
+        state.opp_bet = raise_size
+
+        return "Opponent raises to " + str(raise_size)
+
+    def bot_checkfold(self, state):
+        """Bot check/fold"""
+
+        # If facing a raise, fold and give chips in pot to player. If not, check.
+        if state.bet > state.opp_bet:
+            state.chips = state.chips + state.bet + state.opp_bet + state.pot
+            return "Opponent folds"
+
+        return "Opponent checks"
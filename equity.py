@@ -0,0 +1,180 @@
+"""Equity estimates for the bot from the cards visible on the current street"""
+
+import math
+import sys
+import time
+from functools import lru_cache
+
+import numpy as np
+
+import evaluator
+
+# Number of board cards visible on each street
+VISIBLE_CARDS = {"preflop": 0, "flop": 3, "turn": 4, "river": 5}
+
+# Default sampling budget for one estimate, and how many samples are drawn per vectorized batch
+DEFAULT_SAMPLES = 2000
+BATCH_SIZE = 500
+
+# Runouts ranked per vectorized chunk by exact_equity, which bounds its memory even preflop
+RUNOUT_CHUNK = 250000
+
+
+"""Returns the part of a concatenated board string that can be seen on the given street"""
+def visible_board(board, street):
+    return board[:2 * VISIBLE_CARDS[street]]
+
+
+"""Returns (equity, low, high, samples) as a dictionary, with a 95% confidence interval around the mean of per-sample outcomes"""
+def summarize(outcomes):
+    n = len(outcomes)
+    mean = float(np.mean(outcomes))
+    if n > 1:
+        margin = 1.96 * float(np.std(outcomes, ddof=1)) / math.sqrt(n)
+    else:
+        margin = 0.5
+    return {"equity": mean, "low": max(0.0, mean - margin), "high": min(1.0, mean + margin), "samples": n}
+
+
+"""Returns the holdings of an opponent range, every holding if the range is None, that don't use any of the dead integer cards"""
+def live_range(opponent_range, dead):
+    if opponent_range is None:
+        return evaluator.live_combos(dead)
+    opponent_range = np.asarray(opponent_range, dtype=np.int64).reshape(-1, 2)
+    return opponent_range[~np.isin(opponent_range, dead).any(axis=1)]
+
+
+"""Returns the live holdings of an opponent range and the probability of each, None meaning every holding is equally likely"""
+def weighted_range(opponent_range, opponent_weights, dead):
+    if opponent_weights is None:
+        return live_range(opponent_range, dead), None
+    combos = np.asarray(opponent_range, dtype=np.int64).reshape(-1, 2)
+    live = ~np.isin(combos, dead).any(axis=1) & (np.asarray(opponent_weights) > 0)
+    weights = np.asarray(opponent_weights, dtype=float)[live]
+    return combos[live], weights / weights.sum()
+
+
+"""Returns the exact equity of an integer hand against every live opponent holding on a complete integer board, weighted by opponent_weights if given"""
+def river_equity(hand, board, opponent_range=None, opponent_weights=None):
+    rank = evaluator.hand_rank(hand + board)
+    combos, probabilities = weighted_range(opponent_range, opponent_weights, hand + board)
+    ranks = evaluator.rank_batch(combos, board)
+    equity = np.average((ranks < rank) + 0.5 * (ranks == rank), weights=probabilities)
+    return {"equity": float(equity), "low": float(equity), "high": float(equity), "samples": len(ranks)}
+
+
+"""Estimates the equity of an integer hand given the visible integer board cards, against a random holding or one drawn from opponent_range (uniformly, or in proportion to opponent_weights)"""
+def estimate_equity(hand, board, samples=DEFAULT_SAMPLES, time_limit=None, rng=None, opponent_range=None, opponent_weights=None):
+
+    # A complete board has no runouts left, so every opponent holding is enumerated exactly
+    if len(board) == 5:
+        return river_equity(hand, board, opponent_range, opponent_weights)
+
+    if rng is None:
+        rng = np.random.default_rng()
+    deadline = None if time_limit is None else time.monotonic() + time_limit
+
+    combos, probabilities = weighted_range(opponent_range, opponent_weights, hand + board)
+    deck = np.array([card for card in range(52) if card not in hand and card not in board], dtype=np.int64)
+    missing = 5 - len(board)
+    hand_board = np.array(hand + board, dtype=np.int64)
+
+    # Samples opponent holdings and runouts until the budget is spent or the time limit passes (at least one batch is always drawn)
+    outcomes = []
+    drawn = 0
+    while drawn < samples:
+        size = min(BATCH_SIZE, samples - drawn)
+
+        # Each row picks an opponent holding, then deals the rest of the board from a random ordering of the deck with the opponent's cards moved last
+        opp = combos[rng.integers(len(combos), size=size) if probabilities is None else rng.choice(len(combos), size=size, p=probabilities)]
+        keys = rng.random((size, len(deck)))
+        keys[deck == opp[:, :1]] = 2
+        keys[deck == opp[:, 1:]] = 2
+        runout = deck[keys.argsort(axis=1)[:, :missing]]
+
+        known = np.tile(hand_board, (size, 1))
+        ranks = evaluator.rank_many(np.hstack([known, runout]))
+        opp_ranks = evaluator.rank_many(np.hstack([opp, known[:, 2:], runout]))
+
+        outcomes.append((ranks > opp_ranks) + 0.5 * (ranks == opp_ranks))
+        drawn += size
+
+        if deadline is not None and time.monotonic() >= deadline:
+            break
+
+    return summarize(np.concatenate(outcomes))
+
+
+"""Returns every k-element combination of range(n) as a (C(n, k), k) int8 array, in lexicographic order"""
+@lru_cache(maxsize=8)
+def index_combinations(n, k):
+    combos = np.zeros((1, 0), dtype=np.int8)
+    for column in range(k):
+
+        # Each row is extended by every index above its last one that still leaves room for the remaining columns
+        first = combos[:, -1].astype(np.int64) + 1 if column > 0 else np.zeros(len(combos), dtype=np.int64)
+        counts = np.maximum(n - (k - column - 1) - first, 0)
+        rows = np.repeat(np.arange(len(combos)), counts)
+        offsets = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+        combos = np.hstack([combos[rows], (np.repeat(first, counts) + offsets).astype(np.int8)[:, None]])
+    return combos
+
+
+"""Returns each integer holding's exact share of the pot over every runout of the integer board, with ties split, plus win and tie frequencies"""
+def exact_equity(holdings, board=()):
+
+    board = list(board)
+    dead = [card for holding in holdings for card in holding] + board
+    deck = np.array([card for card in range(52) if card not in dead], dtype=np.int64)
+    runouts = index_combinations(len(deck), 5 - len(board))
+
+    shares = np.zeros(len(holdings))
+    wins = np.zeros(len(holdings))
+    ties = 0
+    for start in range(0, len(runouts), RUNOUT_CHUNK):
+        chunk = deck[runouts[start:start + RUNOUT_CHUNK]]
+        boards = np.hstack([np.tile(np.array(board, dtype=np.int64), (len(chunk), 1)), chunk])
+        ranks = evaluator.rank_runouts(holdings, boards)
+
+        # Every holding with the best value on a board takes an equal part of it
+        best = ranks == ranks.max(axis=0)
+        winners = best.sum(axis=0)
+        shares += (best / winners).sum(axis=1)
+        wins += (best & (winners == 1)).sum(axis=1)
+        ties += int(np.count_nonzero(winners > 1))
+
+    count = len(runouts)
+    return {"equity": (shares / count).tolist(), "win": (wins / count).tolist(), "tie": ties / count, "runouts": count}
+
+
+"""Returns an error message if holdings and board (lists of integer cards) can't be dealt together, otherwise None"""
+def check_deal(holdings, board):
+    if len(holdings) < 2:
+        return "Need at least two hands"
+    if any(len(holding) != 2 for holding in holdings):
+        return "Each hand must be two cards"
+    if len(board) > 5:
+        return "A board has at most five cards"
+    cards = [card for holding in holdings for card in holding] + board
+    if len(set(cards)) != len(cards):
+        return "A card is dealt twice"
+    return None
+
+
+if __name__ == "__main__":
+    # python equity.py AHAD KSKC [2C7D9H]
+    if len(sys.argv) < 3:
+        sys.exit("Usage: python equity.py HAND HAND [...] [BOARD], e.g. python equity.py AHAD KSKC 2C7D9H")
+    arguments = [evaluator.parse_cards(argument.upper()) for argument in sys.argv[1:]]
+    holdings, board = arguments, []
+    if len(arguments) > 2 and len(arguments[-1]) != 2:
+        holdings, board = arguments[:-1], arguments[-1]
+    error = check_deal(holdings, board)
+    if error:
+        sys.exit(error)
+
+    start = time.monotonic()
+    result = exact_equity(holdings, board)
+    for argument, equity, win in zip(sys.argv[1:], result["equity"], result["win"]):
+        print("%s  equity %.2f%%  win %.2f%%" % (argument.upper(), 100 * equity, 100 * win))
+    print("tie %.2f%% over %d runouts in %.2fs" % (100 * result["tie"], result["runouts"], time.monotonic() - start))
@@ -0,0 +1,68 @@
+"""Bounded LRU cache of equity estimates keyed by suit-isomorphic spots"""
+
+import itertools
+from collections import OrderedDict
+
+import evaluator
+
+SUIT_PERMUTATIONS = list(itertools.permutations(range(4)))
+
+
+"""Returns a key shared by every (hand, board) spot that differs only by a relabelling of suits"""
+def canonical_key(hand, board):
+    best = None
+    for perm in SUIT_PERMUTATIONS:
+        mapped = (tuple(sorted((card & ~3) | perm[card & 3] for card in hand)), tuple(sorted((card & ~3) | perm[card & 3] for card in board)))
+        if best is None or mapped < best:
+            best = mapped
+    return "".join(evaluator.int_to_card(card) for card in best[0]) + "/" + "".join(evaluator.int_to_card(card) for card in best[1])
+
+
+class EquityCache:
+    """In-process LRU cache of equities, optionally backed by the equity_cache table (see migrations.py) shared by every worker"""
+
+    def __init__(self, max_size, db=None):
+        self.max_size = max_size
+        self.db = db
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Returns the cached equity for a key, or None on a miss"""
+
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+
+        # Falls back to the shared table, remembering its answer locally
+        if self.db is not None:
+            rows = self.db.execute("SELECT equity FROM equity_cache WHERE key = ?", key)
+            if len(rows) > 0:
+                self.hits += 1
+                self.remember(key, rows[0]['equity'])
+                return rows[0]['equity']
+
+        self.misses += 1
+        return None
+
+    def put(self, key, equity):
+        """Stores an equity locally and in the shared table"""
+
+        self.remember(key, equity)
+        if self.db is not None:
+            self.db.execute("INSERT INTO equity_cache (key, equity) VALUES (?, ?) ON CONFLICT (key) DO NOTHING", key, equity)
+
+    def remember(self, key, equity):
+        """Adds an entry to the in-process cache, evicting the least recently used one when full"""
+
+        self.entries[key] = equity
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def stats(self):
+        """Returns hit/miss counters and the current size"""
+
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.entries)}
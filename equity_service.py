@@ -0,0 +1,95 @@
+"""Runs equity estimates in a process pool with a timeout and a cheap fallback"""
+
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+from equity import estimate_equity, exact_equity
+from preflop import preflop_equity
+
+
+class EquityService:
+    """Submits equity estimates to a pool of worker processes so request threads only wait up to a timeout"""
+
+    def __init__(self, workers=2, timeout=0.25, fallback_samples=200):
+        self.workers = workers
+        self.timeout = timeout
+        self.fallback_samples = fallback_samples
+        self.pool = None
+        self.timeouts = 0
+        self.busy = 0
+
+        # Submitted estimates that haven't finished, including ones a timed-out request gave up on
+        self.pending = set()
+
+    def estimate(self, hand, board, samples, time_limit=None, opponent_range=None, opponent_weights=None):
+        """Returns estimate_equity's result (with "fallback" set if the timeout was hit) for integer cards"""
+
+        # A pool of zero workers runs estimates inline
+        if self.workers == 0:
+            result = estimate_equity(hand, board, samples=samples, time_limit=time_limit, opponent_range=opponent_range, opponent_weights=opponent_weights)
+            result["fallback"] = False
+            return result
+
+        # Creates the pool on first use so it is started inside each worker process, not in a preloading parent
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+
+        # cancel() can't stop an estimate a worker has already started, so one is only submitted when a worker is free
+        # (otherwise it would queue behind abandoned ones), and its own time limit is capped at the timeout so an
+        # abandoned estimate frees its worker about when the request stops waiting for it
+        if len(self.pending) >= self.workers:
+            self.busy += 1
+            return self.fallback(hand, board, opponent_range, opponent_weights)
+        time_limit = self.timeout if time_limit is None else min(time_limit, self.timeout)
+
+        future = self.pool.submit(estimate_equity, hand, board, samples, time_limit, None, opponent_range, opponent_weights)
+        self.pending.add(future)
+        future.add_done_callback(self.pending.discard)
+        try:
+            result = future.result(timeout=self.timeout)
+            result["fallback"] = False
+            return result
+        except TimeoutError:
+            self.timeouts += 1
+            return self.fallback(hand, board, opponent_range, opponent_weights)
+
+    def exact(self, holdings, board, timeout):
+        """Returns exact_equity's result for integer cards from a pool process, or None if every process is busy or it takes longer than timeout seconds"""
+
+        if self.workers == 0:
+            return exact_equity(holdings, board)
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+
+        # Like estimate(), nothing is queued behind a busy pool; an enumeration that times out keeps its process until it finishes
+        if len(self.pending) >= self.workers:
+            self.busy += 1
+            return None
+
+        future = self.pool.submit(exact_equity, holdings, board)
+        self.pending.add(future)
+        future.add_done_callback(self.pending.discard)
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            self.timeouts += 1
+            return None
+
+    def fallback(self, hand, board, opponent_range=None, opponent_weights=None):
+        """Returns a cheap estimate: the preflop table when there is no board or range, otherwise a small inline sample"""
+
+        if len(board) == 0 and opponent_range is None:
+            equity = preflop_equity(hand)
+            if equity is not None:
+                return {"equity": equity, "low": equity, "high": equity, "samples": 0, "fallback": True}
+
+        result = estimate_equity(hand, board, samples=self.fallback_samples, opponent_range=opponent_range, opponent_weights=opponent_weights)
+        result["fallback"] = True
+        return result
+
+    def shutdown(self):
+        """Stops the worker processes"""
+
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+            self.pending.clear()
@@ -0,0 +1,437 @@
+"""Integer card encoding and table-driven hand evaluation"""
+
+import itertools
+import mmap
+import os
+import zlib
+from array import array
+
+import numpy as np
+
+RANKS = "23456789TJQKA"
+SUITS = "CHDS"
+
+# Hand categories, weakest to strongest
+HIGH_CARD = 0
+ONE_PAIR = 1
+TWO_PAIR = 2
+THREE_OF_A_KIND = 3
+STRAIGHT = 4
+FLUSH = 5
+FULL_HOUSE = 6
+FOUR_OF_A_KIND = 7
+STRAIGHT_FLUSH = 8
+
+# Cards are integers 0-51: rank * 4 + suit, with rank 0-12 (2 to A) and suit 0-3 (C, H, D, S)
+CARD_INDEX = {}
+for r in range(13):
+    for s in range(4):
+        CARD_INDEX[RANKS[r] + SUITS[s]] = r * 4 + s
+
+# Rank bitmasks of the ten straights, highest first (the wheel A-2-3-4-5 is last)
+STRAIGHT_MASKS = [0b11111 << i for i in range(8, -1, -1)] + [0b1000000001111]
+
+
+"""Converts a card string like "AS" to its integer"""
+def card_to_int(card):
+    return CARD_INDEX[card]
+
+
+"""Converts an integer back to its card string"""
+def int_to_card(card):
+    return RANKS[card >> 2] + SUITS[card & 3]
+
+
+"""Converts a concatenated card string like "ASKD" to a list of integers"""
+def parse_cards(cards):
+    return [CARD_INDEX[cards[i:i+2]] for i in range(0, len(cards), 2)]
+
+
+"""Packs a category and up to five ranks (high to low) into one comparable integer"""
+def pack(category, ranks):
+    value = category
+    for i in range(5):
+        value = (value << 4) | (ranks[i] if i < len(ranks) else 0)
+    return value
+
+
+"""Returns the high rank of the best straight in a rank bitmask, -1 if none"""
+def straight_high(mask):
+    for i in range(len(STRAIGHT_MASKS)):
+        if mask & STRAIGHT_MASKS[i] == STRAIGHT_MASKS[i]:
+            return 12 - i if i < 9 else 3
+    return -1
+
+
+"""Returns the packed value of the best flush or straight flush in a single suit's rank bitmask"""
+def rank_flush_mask(mask):
+    high = straight_high(mask)
+    if high >= 0:
+        return pack(STRAIGHT_FLUSH, [high])
+    ranks = [r for r in range(12, -1, -1) if mask >> r & 1]
+    return pack(FLUSH, ranks[:5])
+
+
+"""Returns the packed value of the best non-flush hand given the count of each rank"""
+def rank_counts(counts):
+
+    # Groups ranks by how many times they appear, highest ranks first
+    quads = [r for r in range(12, -1, -1) if counts[r] == 4]
+    trips = [r for r in range(12, -1, -1) if counts[r] == 3]
+    pairs = [r for r in range(12, -1, -1) if counts[r] == 2]
+    present = [r for r in range(12, -1, -1) if counts[r] > 0]
+
+    if quads:
+        kickers = [r for r in present if r != quads[0]]
+        return pack(FOUR_OF_A_KIND, [quads[0]] + kickers[:1])
+
+    # Two sets of trips make a full house with the lower set as the pair
+    if trips and (len(trips) > 1 or pairs):
+        pair = max(trips[1:] + pairs)
+        return pack(FULL_HOUSE, [trips[0], pair])
+
+    mask = 0
+    for r in present:
+        mask |= 1 << r
+    high = straight_high(mask)
+    if high >= 0:
+        return pack(STRAIGHT, [high])
+
+    if trips:
+        kickers = [r for r in present if r != trips[0]]
+        return pack(THREE_OF_A_KIND, [trips[0]] + kickers[:2])
+
+    if len(pairs) >= 2:
+        kickers = [r for r in present if r != pairs[0] and r != pairs[1]]
+        return pack(TWO_PAIR, pairs[:2] + kickers[:1])
+
+    if pairs:
+        kickers = [r for r in present if r != pairs[0]]
+        return pack(ONE_PAIR, [pairs[0]] + kickers[:3])
+
+    return pack(HIGH_CARD, present[:5])
+
+
+# Number of rank-count vectors (each count 0-4) over the last j ranks that sum to s
+COMPLETIONS = [[0] * 8 for j in range(14)]
+COMPLETIONS[0][0] = 1
+for j in range(1, 14):
+    for s in range(8):
+        COMPLETIONS[j][s] = sum(COMPLETIONS[j-1][s-c] for c in range(5) if s - c >= 0)
+
+# INDEX_OFFSET[i][rem][c] is how many vectors come before one with count c at rank i, given rem cards left to place
+INDEX_OFFSET = []
+for i in range(13):
+    by_rem = []
+    for rem in range(8):
+        offsets = [0]
+        for c in range(4):
+            offsets.append(offsets[-1] + (COMPLETIONS[12-i][rem-c] if rem - c >= 0 else 0))
+        by_rem.append(offsets)
+    INDEX_OFFSET.append(by_rem)
+
+# Start of each hand size's block in the non-flush table (5, 6 and 7 cards share one table)
+SIZE_BASE = {5: 0, 6: COMPLETIONS[13][5], 7: COMPLETIONS[13][5] + COMPLETIONS[13][6]}
+NOFLUSH_SIZE = COMPLETIONS[13][5] + COMPLETIONS[13][6] + COMPLETIONS[13][7]
+
+
+"""Returns the combinatorial index of a rank-count vector within the non-flush table"""
+def counts_index(counts, n):
+    index = SIZE_BASE[n]
+    rem = n
+    for i in range(13):
+        c = counts[i]
+        if c:
+            index += INDEX_OFFSET[i][rem][c]
+            rem -= c
+            if rem == 0:
+                break
+    return index
+
+
+"""Builds the non-flush table (indexed by counts_index) and the flush table (indexed by suit bitmask)"""
+def build_tables():
+
+    noflush = [0] * NOFLUSH_SIZE
+    counts = [0] * 13
+
+    # Walks every count vector summing to n in index order
+    def fill(i, rem, index):
+        if i == 13:
+            noflush[index] = rank_counts(counts)
+            return index + 1
+        for c in range(min(4, rem) + 1):
+            if COMPLETIONS[12-i][rem-c] == 0:
+                continue
+            counts[i] = c
+            index = fill(i + 1, rem - c, index)
+        counts[i] = 0
+        return index
+
+    for n in (5, 6, 7):
+        fill(0, n, SIZE_BASE[n])
+
+    flush = [0] * 8192
+    for mask in range(8192):
+        if bin(mask).count("1") >= 5:
+            flush[mask] = rank_flush_mask(mask)
+
+    return noflush, flush
+
+
+# Rank tables generated offline by build_tables.py
+TABLES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "hand_ranks.bin")
+TABLES_MAGIC = 0x4B4E5248 # "HRNK"
+
+# Format of hand_ranks.bin; bump it (and rerun build_tables.py) whenever pack(), the categories or the table indexing
+# change, since tables of the same size from an older encoding would otherwise load as current
+TABLES_VERSION = 2
+HEADER_SIZE = 5
+
+
+"""Writes the rank tables to a binary file of native uint32s: a header (magic, format version, CRC-32 of the tables, table sizes), the non-flush table, then the flush table"""
+def write_tables(path=TABLES_PATH):
+    noflush, flush = build_tables()
+    body = array("I", noflush + flush)
+    data = array("I", [TABLES_MAGIC, TABLES_VERSION, zlib.crc32(body), len(noflush), len(flush)]) + body
+    with open(path, "wb") as f:
+        data.tofile(f)
+
+
+"""Maps the rank tables read-only so every worker process shares one copy, building them in memory if the file is missing"""
+def load_tables(path=TABLES_PATH):
+    try:
+        with open(path, "rb") as f:
+            tables = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)).cast("I")
+    except (OSError, ValueError):
+        return build_tables()
+
+    # Rebuilds if the file is from another format version or build, or was truncated or corrupted since it was written
+    if len(tables) != HEADER_SIZE + NOFLUSH_SIZE + 8192:
+        return build_tables()
+    magic, version, checksum, noflush_size, flush_size = tables[:HEADER_SIZE]
+    if (magic, version, noflush_size, flush_size) != (TABLES_MAGIC, TABLES_VERSION, NOFLUSH_SIZE, 8192) or zlib.crc32(tables[HEADER_SIZE:]) != checksum:
+        return build_tables()
+
+    return tables[HEADER_SIZE:HEADER_SIZE+NOFLUSH_SIZE], tables[HEADER_SIZE+NOFLUSH_SIZE:]
+
+
+NOFLUSH_TABLE, FLUSH_TABLE = load_tables()
+
+
+"""Returns the comparable value of the best hand in 5 to 7 integer cards (higher is stronger)"""
+def hand_rank(cards):
+
+    counts = [0] * 13
+    suit_masks = [0, 0, 0, 0]
+    for card in cards:
+        counts[card >> 2] += 1
+        suit_masks[card & 3] |= 1 << (card >> 2)
+
+    # With at most 7 cards, a flush can't coexist with quads or a full house
+    for mask in suit_masks:
+        if FLUSH_TABLE[mask]:
+            return FLUSH_TABLE[mask]
+
+    return NOFLUSH_TABLE[counts_index(counts, len(cards))]
+
+
+# NumPy views of the rank tables and index offsets for batch evaluation (no copy when the tables are memory-mapped)
+NOFLUSH_ARRAY = np.asarray(NOFLUSH_TABLE, dtype=np.uint32)
+FLUSH_ARRAY = np.asarray(FLUSH_TABLE, dtype=np.uint32)
+INDEX_OFFSET_ARRAY = np.array([[offsets + [0] for offsets in by_rem] for by_rem in INDEX_OFFSET], dtype=np.int64)
+
+
+# All 1,326 two-card holdings as index pairs, with a 52-bit mask of the cards each one uses
+COMBOS = np.array(list(itertools.combinations(range(52), 2)), dtype=np.int64)
+COMBO_MASKS = (np.uint64(1) << COMBOS[:, 0].astype(np.uint64)) | (np.uint64(1) << COMBOS[:, 1].astype(np.uint64))
+
+
+"""Returns the rows of COMBOS that don't use any of the dead integer cards"""
+def live_combos(dead):
+    dead_mask = 0
+    for card in dead:
+        dead_mask |= 1 << card
+    return COMBOS[(COMBO_MASKS & np.uint64(dead_mask)) == 0]
+
+
+"""Returns the values of rows given their (N, 13) rank counts, (N, 4) suit masks and card count n, plus each rank's count of lower-ranked cards if already known"""
+def rank_arrays(counts, masks, n, below=None):
+
+    # Combinatorial index of each row's rank counts, matching counts_index
+    if below is None:
+        below = np.cumsum(counts, axis=1) - counts
+    remaining = n - below
+    index = SIZE_BASE[n] + INDEX_OFFSET_ARRAY[np.arange(13), remaining, counts].sum(axis=1)
+
+    # Flush values are nonzero only for a suit with five or more cards
+    flush = FLUSH_ARRAY[masks].max(axis=1)
+    return np.where(flush > 0, flush, NOFLUSH_ARRAY[index])
+
+
+"""Adds each column of an (N, k) integer card array into the rank counts and suit masks, one column at a time so pairs and suited cards accumulate"""
+def add_cards(counts, masks, cards):
+    rows = np.arange(len(cards))
+    for column in range(cards.shape[1]):
+        ranks = cards[:, column] >> 2
+        suits = cards[:, column] & 3
+        counts[rows, ranks] += 1
+        masks[rows, suits] |= 1 << ranks
+
+
+class HandState:
+    """Rank counts and suit masks of many holdings on one board, kept between streets so each new board card is only added once"""
+
+    def __init__(self, holdings, board=()):
+        holdings = np.asarray(holdings, dtype=np.int64).reshape(-1, 2)
+        self.counts = np.zeros((len(holdings), 13), dtype=np.int64)
+        self.masks = np.zeros((len(holdings), 4), dtype=np.int64)
+        self.size = 2
+        add_cards(self.counts, self.masks, holdings)
+
+        # Number of cards below each rank, which rank_arrays would otherwise recompute from the counts every time
+        self.below = np.cumsum(self.counts, axis=1) - self.counts
+        for card in board:
+            self.add_card(card)
+
+    def add_card(self, card):
+        """Adds one board card to every holding"""
+
+        self.counts[:, card >> 2] += 1
+        self.masks[:, card & 3] |= 1 << (card >> 2)
+        self.below[:, (card >> 2) + 1:] += 1
+        self.size += 1
+
+    def values(self, rows=None):
+        """Returns the value of every holding with the board so far (at least three cards), or of the selected rows"""
+
+        if rows is None:
+            return rank_arrays(self.counts, self.masks, self.size, self.below)
+        return rank_arrays(self.counts[rows], self.masks[rows], self.size, self.below[rows])
+
+    def copy(self):
+        """Returns an independent copy, e.g. to try a card without changing this state"""
+
+        other = HandState.__new__(HandState)
+        other.counts, other.masks, other.below, other.size = self.counts.copy(), self.masks.copy(), self.below.copy(), self.size
+        return other
+
+
+"""Returns the values of many holdings sharing one board: holdings is an (N, 2) array of integer cards, board a list of integer cards"""
+def rank_batch(holdings, board):
+    return HandState(holdings, board).values()
+
+
+"""Returns the values of an (N, k) array of integer card sets, 5 <= k <= 7, each row a separate hand"""
+def rank_many(cards):
+    cards = np.asarray(cards, dtype=np.int64)
+    counts = np.zeros((len(cards), 13), dtype=np.int64)
+    masks = np.zeros((len(cards), 4), dtype=np.int64)
+    add_cards(counts, masks, cards)
+    return rank_arrays(counts, masks, cards.shape[1])
+
+
+# Per-rank keys whose sums are distinct for every 7-card rank count (at most four of a rank), so a board's key can be summed once and each holding adds its own
+SEVEN_RANK_KEYS = np.array([0, 1, 5, 22, 98, 453, 2031, 8698, 22854, 83661, 262349, 636345, 1479181], dtype=np.int64)
+CARD_KEYS = SEVEN_RANK_KEYS[np.arange(52) >> 2]
+
+# Each card as one bit of a 64-bit word holding all four suits' rank masks, 16 bits per suit
+CARD_SUIT_BITS = np.array([1 << ((card & 3) * 16 + (card >> 2)) for card in range(52)], dtype=np.int64)
+
+
+"""Returns the sorted 7-card rank-count keys and the non-flush value of each, built once on first use"""
+def seven_card_keys():
+    global SEVEN_KEYS, SEVEN_VALUES
+    if SEVEN_KEYS is None:
+
+        # Every way to deal 7 cards over 13 ranks with at most four of each
+        vectors = [[]]
+        for rank in range(13):
+            vectors = [vector + [count] for vector in vectors for count in range(min(4, 7 - sum(vector)) + 1) if rank < 12 or sum(vector) + count == 7]
+        counts = np.array(vectors, dtype=np.int64)
+
+        keys = counts @ SEVEN_RANK_KEYS
+        values = rank_arrays(counts, np.zeros((len(counts), 4), dtype=np.int64), 7)
+        order = np.argsort(keys)
+        SEVEN_KEYS, SEVEN_VALUES = keys[order], values[order]
+    return SEVEN_KEYS, SEVEN_VALUES
+
+
+SEVEN_KEYS = None
+SEVEN_VALUES = None
+
+
+"""Returns a (len(holdings), N) array of values of each integer holding on each row of an (N, 5) array of complete boards"""
+def rank_runouts(holdings, boards):
+
+    keys, values = seven_card_keys()
+    boards = np.asarray(boards, dtype=np.int64)
+    board_keys = CARD_KEYS[boards].sum(axis=1)
+    board_bits = CARD_SUIT_BITS[boards].sum(axis=1)
+
+    ranks = np.empty((len(holdings), len(boards)), dtype=np.uint32)
+    for i, holding in enumerate(holdings):
+        noflush = values[np.searchsorted(keys, board_keys + CARD_KEYS[holding].sum())]
+
+        # Cards are distinct, so adding bits is the same as or-ing them; only a suit with five or more cards has a flush value
+        bits = board_bits + CARD_SUIT_BITS[holding].sum()
+        flush = FLUSH_ARRAY[bits & 0x1FFF]
+        for suit in range(1, 4):
+            flush = np.maximum(flush, FLUSH_ARRAY[(bits >> (16 * suit)) & 0x1FFF])
+        ranks[i] = np.where(flush > 0, flush, noflush)
+    return ranks
+
+
+"""Returns the value of the best hand in hand + board (card strings or lists of integer cards), higher is stronger"""
+def evaluate(hand, board=""):
+    cards = parse_cards(hand) if isinstance(hand, str) else list(hand)
+    cards += parse_cards(board) if isinstance(board, str) else list(board)
+
+    # The tables index rank counts, so a card seen twice (e.g. a holding that reuses a board card) would either
+    # overflow the index or quietly rank a hand that can't exist
+    if len(set(cards)) != len(cards):
+        raise ValueError("duplicate card in " + " ".join(int_to_card(card) for card in cards))
+    if not 5 <= len(cards) <= 7:
+        raise ValueError("expected 5 to 7 cards, got %d" % len(cards))
+    return hand_rank(cards)
+
+
+RANK_NAMES = ["Two", "Three", "Four", "Five", "Six", "Seven", "Eight", "Nine", "Ten", "Jack", "Queen", "King", "Ace"]
+RANK_PLURALS = ["Twos", "Threes", "Fours", "Fives", "Sixes", "Sevens", "Eights", "Nines", "Tens", "Jacks", "Queens", "Kings", "Aces"]
+
+
+"""Returns a readable name for a hand value, such as Two Pair, Kings and Sevens"""
+def describe(value):
+    category = value >> 20
+    ranks = [(value >> shift) & 15 for shift in (16, 12, 8, 4, 0)]
+
+    if category == STRAIGHT_FLUSH:
+        if ranks[0] == 12:
+            return "Royal Flush"
+        return "Straight Flush, " + RANK_NAMES[ranks[0]] + " High"
+    if category == FOUR_OF_A_KIND:
+        return "Four of a Kind, " + RANK_PLURALS[ranks[0]]
+    if category == FULL_HOUSE:
+        return "Full House, " + RANK_PLURALS[ranks[0]] + " over " + RANK_PLURALS[ranks[1]]
+    if category == FLUSH:
+        return "Flush, " + RANK_NAMES[ranks[0]] + " High"
+    if category == STRAIGHT:
+        return "Straight, " + RANK_NAMES[ranks[0]] + " High"
+    if category == THREE_OF_A_KIND:
+        return "Three of a Kind, " + RANK_PLURALS[ranks[0]]
+    if category == TWO_PAIR:
+        return "Two Pair, " + RANK_PLURALS[ranks[0]] + " and " + RANK_PLURALS[ranks[1]]
+    if category == ONE_PAIR:
+        return "Pair of " + RANK_PLURALS[ranks[0]]
+    return "High Card, " + RANK_NAMES[ranks[0]]
+
+
+"""Returns 0 if hand 1 wins, 1 if hand 2 wins, 2 if split (all arguments are card strings)"""
+def compare(h1, h2, board):
+    rank1 = evaluate(h1, board)
+    rank2 = evaluate(h2, board)
+    if rank1 > rank2:
+        return 0
+    if rank2 > rank1:
+        return 1
+    return 2
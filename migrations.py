@@ -0,0 +1,169 @@
+"""Versioned schema changes, applied in order at startup, and a check that the hot queries use an index
+
+Usage:
+    python migrations.py
+
+applies any pending migrations to the database (see database.py) and, on SQLite, prints the query plan of every hot
+query, exiting with status 1 if one of them scans a whole table. Each migration is recorded in the migrations table so
+it runs once per database, on top of the baseline tables the app started with. Statements are written for both SQLite
+and PostgreSQL, with {id}, {float} and {blob} standing for the column types that differ between them.
+"""
+
+import re
+import sys
+from contextlib import contextmanager
+
+from database import DATABASE_PATH, DATABASE_URL, backend, connect_sqlite, get_database, transaction
+
+# Column types that SQLite and PostgreSQL spell differently
+COLUMN_TYPES = {
+    "sqlite": {"id": "integer PRIMARY KEY NOT NULL", "float": "REAL", "blob": "BLOB"},
+    "postgresql": {"id": "SERIAL PRIMARY KEY", "float": "DOUBLE PRECISION", "blob": "BYTEA"},
+}
+
+# The tables the app started with. migrate() creates them in an empty database (e.g. a new PostgreSQL one) before
+# applying any version, and every change since is a version below.
+BASELINE = [
+    "CREATE TABLE IF NOT EXISTS users (id {id}, username text NOT NULL, password text NOT NULL, wins integer NOT NULL, losses integer NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS games (id {id}, player_id integer NOT NULL, active integer NOT NULL, chips integer, opp_chips integer, pot integer, position text, street text, hand text, opp_hand text, board text, bet integer, opp_bet integer, displayed integer)",
+    "CREATE TABLE IF NOT EXISTS logs (id {id}, game_id integer)",
+    "CREATE TABLE IF NOT EXISTS entries (id {id}, entry text, log_id integer)",
+]
+
+# (version, description, statements), applied in order of version; new versions go at the end
+MIGRATIONS = [
+    (1, "Index the lookups every request makes", [
+        # Only active games are looked up by player, and they are a small slice of the table
+        "CREATE INDEX IF NOT EXISTS games_active_player ON games (player_id) WHERE active = 1",
+        "CREATE INDEX IF NOT EXISTS logs_game ON logs (game_id)",
+        "CREATE INDEX IF NOT EXISTS entries_log ON entries (log_id, id)",
+    ]),
+    (2, "Make usernames unique", [
+        "CREATE UNIQUE INDEX IF NOT EXISTS users_username ON users (username)",
+    ]),
+    (3, "Add the analysis table written by analyze.py", [
+        "CREATE TABLE IF NOT EXISTS analysis (id {id}, game_id integer NOT NULL, hand integer NOT NULL, street text NOT NULL, actor text NOT NULL, action text NOT NULL, player_equity {float}, bot_equity {float}, bot_strength {float})",
+        "CREATE INDEX IF NOT EXISTS analysis_game ON analysis (game_id)",
+    ]),
+    (4, "Add the bot's hand strength, kept for the rest of a street", [
+        "ALTER TABLE games ADD COLUMN strength {float}",
+        "ALTER TABLE games ADD COLUMN strength_key text",
+    ]),
+    (5, "Add the seed each hand is dealt from", [
+        "ALTER TABLE games ADD COLUMN seed bigint",
+    ]),
+    (6, "Add the user's range, narrowed by their actions", [
+        "ALTER TABLE games ADD COLUMN opp_range {blob}",
+    ]),
+    (7, "Add the seeds of every hand dealt, for replaying games", [
+        "CREATE TABLE IF NOT EXISTS hands (id {id}, log_id integer NOT NULL, seed bigint NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS hands_log ON hands (log_id, id)",
+    ]),
+    (8, "Add the equity estimates shared by every worker", [
+        "CREATE TABLE IF NOT EXISTS equity_cache (key text PRIMARY KEY NOT NULL, equity {float} NOT NULL)",
+    ]),
+]
+
+# Every gunicorn worker migrates when it starts, so migrations take the database's write lock before reading anything:
+# on SQLite a deferred transaction that reads and then writes fails at once with "database is locked" when another
+# process got there first, so they begin IMMEDIATE and wait their turn (up to database.SQLITE_TIMEOUT seconds);
+# on PostgreSQL they hold a transaction-level advisory lock (the number is arbitrary but fixed).
+BEGIN_STATEMENTS = {"sqlite": "BEGIN IMMEDIATE", "postgresql": "BEGIN"}
+ADVISORY_LOCK = 5710
+
+# ALTER TABLE ... ADD COLUMN has no IF NOT EXISTS in SQLite, so migrate() skips columns that are already there
+ADD_COLUMN = re.compile(r"ALTER TABLE (\w+) ADD COLUMN (\w+)")
+
+# (name, query, example parameters) for every query run on each request or per game; none of them may scan a table
+HOT_QUERIES = [
+    ("load_game", "SELECT games.*, logs.id AS log_id, users.username FROM games JOIN logs ON logs.game_id = games.id JOIN users ON users.id = games.player_id WHERE games.player_id = ? AND games.active = 1", (1,)),
+    ("active game", "SELECT * FROM games WHERE player_id = ? AND active = 1", (1,)),
+    ("save_state", "UPDATE games SET pot = ? WHERE id = ?", (0, 1)),
+    ("latest log entries", "SELECT id, entry FROM entries WHERE log_id = ? ORDER BY id DESC LIMIT ?", (1, 51)),
+    ("log entries after", "SELECT id, entry FROM entries WHERE log_id = ? AND id > ? ORDER BY id LIMIT ?", (1, 0, 51)),
+    ("log entries before", "SELECT id, entry FROM entries WHERE log_id = ? AND id < ? ORDER BY id DESC LIMIT ?", (1, 100, 51)),
+    ("user by id", "SELECT * FROM users WHERE id = ?", (1,)),
+    ("user by name", "SELECT * FROM users WHERE username = ?", ("",)),
+    ("equity cache", "SELECT equity FROM equity_cache WHERE key = ?", ("",)),
+    ("hand seeds", "SELECT log_id, seed FROM hands WHERE log_id IN (?, ?) ORDER BY id", (1, 2)),
+    ("finished games", "SELECT id FROM games WHERE active = 0 AND id > ? ORDER BY id LIMIT ?", (0, 100)),
+    ("analysis rows", "DELETE FROM analysis WHERE game_id IN (?, ?)", (1, 2)),
+]
+
+
+"""Returns the names of a table's columns"""
+def table_columns(db, table, url=DATABASE_URL):
+    if backend(url) == "sqlite":
+        return {row['name'] for row in db.execute("SELECT name FROM pragma_table_info(?)", table)}
+    return {row['name'] for row in db.execute("SELECT column_name AS name FROM information_schema.columns WHERE table_name = ?", table)}
+
+
+"""Applies every migration db (a handle on url) hasn't recorded yet, each in its own transaction, and returns the versions applied"""
+def migrate(db, url=DATABASE_URL):
+
+    types = COLUMN_TYPES[backend(url)]
+    with migration_transaction(db, url):
+        for statement in BASELINE:
+            db.execute(statement.format(**types))
+        db.execute("CREATE TABLE IF NOT EXISTS migrations (version integer PRIMARY KEY NOT NULL, description text NOT NULL)")
+    applied = {row['version'] for row in db.execute("SELECT version FROM migrations")}
+
+    versions = []
+    for version, description, statements in MIGRATIONS:
+        if version in applied:
+            continue
+        with migration_transaction(db, url):
+
+            # Read under the lock, so a version another process applied while this one waited isn't applied twice
+            if db.execute("SELECT version FROM migrations WHERE version = ?", version):
+                continue
+            for statement in statements:
+                column = ADD_COLUMN.match(statement)
+                if column and column.group(2) in table_columns(db, column.group(1), url):
+                    continue
+                db.execute(statement.format(**types))
+            db.execute("INSERT INTO migrations (version, description) VALUES (?, ?)", version, description)
+        versions.append(version)
+    return versions
+
+
+"""Returns a transaction on db (a handle on url) that holds the migration lock from its first statement"""
+@contextmanager
+def migration_transaction(db, url=DATABASE_URL):
+    with transaction(db, BEGIN_STATEMENTS[backend(url)]):
+        if backend(url) == "postgresql":
+            db.execute("SELECT pg_advisory_xact_lock(?)", ADVISORY_LOCK)
+        yield
+
+
+"""Returns {query name: query plan lines} and the names of the hot queries whose plan scans a table, for the SQLite database at path"""
+def check_query_plans(path=DATABASE_PATH):
+
+    # CS50's SQL only returns rows for SELECTs, so the plans are read through sqlite3 directly
+    connection = connect_sqlite(path)
+    plans = {}
+    scans = []
+    for name, query, parameters in HOT_QUERIES:
+        plans[name] = [row[3] for row in connection.execute("EXPLAIN QUERY PLAN " + query, parameters)]
+        if any(line.startswith("SCAN ") for line in plans[name]):
+            scans.append(name)
+    connection.close()
+    return plans, scans
+
+
+def main():
+    versions = migrate(get_database())
+    print("Applied migrations: " + (", ".join(str(version) for version in versions) if versions else "none pending"))
+
+    # EXPLAIN QUERY PLAN is SQLite's; PostgreSQL plans depend on table statistics, so they are left to EXPLAIN by hand
+    if backend() != "sqlite":
+        return
+
+    plans, scans = check_query_plans(DATABASE_URL[len("sqlite:///"):])
+    for name, plan in plans.items():
+        print("%-20s %s  %s" % (name, "SCAN" if name in scans else "ok  ", " | ".join(plan)))
+    sys.exit(1 if scans else 0)
+
+
+if __name__ == "__main__":
+    main()
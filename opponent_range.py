@@ -0,0 +1,148 @@
+"""The user's likely holdings during one hand, narrowed as they check, call and raise"""
+
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+import evaluator
+from preflop import EQUITY, hand_class
+
+# Each holding's weight is multiplied by floor + (1 - floor) * strength ** power after an action, where strength is the
+# holding's percentile on the visible board. Raises favour strong holdings (with some bluffs), calls favour them less,
+# and checks keep most strong holdings because they are sometimes slowplayed.
+ACTION_LIKELIHOODS = {"raise": (0.1, 2), "call": (0.2, 1)}
+CHECK_SLOWPLAY = 0.5
+
+# Preflop strength of every holding in evaluator.COMBOS (equity against a random hand), 0.5 if the table hasn't been built
+PREFLOP_STRENGTH = np.array([EQUITY[hand_class(combo)]["random"] if EQUITY else 0.5 for combo in evaluator.COMBOS])
+
+
+# Narrowed ranges are grouped for caching by their weighted average percentile on the visible board, in this many steps
+RANGE_BUCKETS = 20
+
+# Holding strengths depend only on the visible board, so they are kept per board for every range (and every request)
+# a worker process handles, least recently used evicted first. Strengths are float32 (about 5 KB a board) and the cache
+# is bounded by BOARD_CACHE_BYTES; the evaluator.HandState behind them is much larger (about 320 KB), so only the most
+# recent RECENT_HAND_STATES are kept, for a later street to add its card to instead of ranking every holding again.
+BOARD_CACHE_BYTES = 32 * 1024 * 1024
+RECENT_HAND_STATES = 16
+board_strength_cache = OrderedDict()
+board_hand_states = OrderedDict()
+
+
+"""Returns the percentile (0 to 1) of each value among all the values, ties sharing the midpoint"""
+def percentiles(values):
+    if len(values) < 2:
+        return np.full(len(values), 0.5)
+    ordered = np.sort(values)
+    below = np.searchsorted(ordered, values, side="left")
+    not_above = np.searchsorted(ordered, values, side="right")
+    return (below + not_above - 1) / 2 / (len(ordered) - 1)
+
+
+"""Returns each holding's strength percentile on the visible integer board, reusing board_strength_cache and board_hand_states"""
+def board_strengths(board):
+
+    key = tuple(board)
+    if key in board_strength_cache:
+        board_strength_cache.move_to_end(key)
+        return board_strength_cache[key]
+
+    # Holdings that use a board card are dead, keep a strength of 0 and are left out of the percentiles
+    live = (evaluator.COMBO_MASKS & np.uint64(sum(1 << card for card in board))) == 0
+    strengths = np.zeros(len(evaluator.COMBOS), dtype=np.float32)
+    if len(board) == 0:
+        strengths[live] = percentiles(PREFLOP_STRENGTH[live])
+    else:
+        # Adds only the new cards to the longest earlier board whose HandState is still kept
+        hands = None
+        for size in range(len(board) - 1, 2, -1):
+            if key[:size] in board_hand_states:
+                hands = board_hand_states[key[:size]].copy()
+                for card in board[size:]:
+                    hands.add_card(card)
+                break
+        if hands is None:
+            hands = evaluator.HandState(evaluator.COMBOS, board)
+        strengths[live] = percentiles(hands.values(live))
+
+        # The river is the last street, so its HandState is never extended
+        if len(board) < 5:
+            board_hand_states[key] = hands
+            if len(board_hand_states) > RECENT_HAND_STATES:
+                board_hand_states.popitem(last=False)
+
+    board_strength_cache[key] = strengths
+    while len(board_strength_cache) * strengths.nbytes > BOARD_CACHE_BYTES:
+        board_strength_cache.popitem(last=False)
+    return strengths
+
+
+class OpponentRange:
+    """Weights over evaluator.COMBOS for the user's holding, updated one action at a time"""
+
+    def __init__(self, weights=None):
+        self.weights = np.ones(len(evaluator.COMBOS)) if weights is None else weights
+
+    @classmethod
+    def from_blob(cls, blob):
+        """Builds a range from the bytes stored in the games table"""
+
+        return cls(np.frombuffer(blob, dtype=np.float32).astype(float))
+
+    def to_blob(self):
+        """Returns the weights as bytes for the games table"""
+
+        return self.weights.astype(np.float32).tobytes()
+
+    def key(self):
+        """Returns a short string that changes whenever the weights do"""
+
+        return "%08x" % zlib.crc32(self.to_blob())
+
+    def is_uniform(self):
+        """Returns True if no action has narrowed the range yet"""
+
+        top = self.weights.max()
+        return bool(np.all((self.weights == 0) | (self.weights == top)))
+
+    def holdings(self, dead):
+        """Returns the live holdings and their probabilities, excluding any using one of the dead integer cards"""
+
+        weights = self.weights.copy()
+        weights[(evaluator.COMBO_MASKS & np.uint64(sum(1 << card for card in dead))) != 0] = 0
+        live = weights > 0
+        return evaluator.COMBOS[live], weights[live] / weights[live].sum()
+
+    def average_strength(self, board, dead):
+        """Returns the range's weighted average strength percentile on the visible integer board, where dead are the bot's integer cards"""
+
+        weights = self.weights * ((evaluator.COMBO_MASKS & np.uint64(sum(1 << card for card in board + dead))) == 0)
+        return float((weights * board_strengths(board)).sum() / weights.sum())
+
+    def bucket(self, board, dead):
+        """Returns which of RANGE_BUCKETS steps of average strength the range falls in on the visible integer board, a coarse key for caching estimates against it"""
+
+        return min(RANGE_BUCKETS - 1, int(self.average_strength(board, dead) * RANGE_BUCKETS))
+
+    def preflop_fraction(self, dead):
+        """Returns the share of the strongest holdings whose average preflop percentile matches this range's, where dead are the bot's integer cards"""
+
+        # The strongest fraction f of all holdings averages a percentile of 1 - f / 2; ranges no stronger than random give 1
+        return min(1.0, 2 * (1 - self.average_strength([], dead)))
+
+    def update(self, action, board, dead):
+        """Reweights the range after the user checks, calls or raises on the visible integer board, where dead are the bot's cards"""
+
+        strengths = board_strengths(board)
+        if action == "check":
+            likelihood = 1 - CHECK_SLOWPLAY * strengths ** 2
+        else:
+            floor, power = ACTION_LIKELIHOODS[action]
+            likelihood = floor + (1 - floor) * strengths ** power
+        self.weights = self.weights * likelihood
+
+        # Holdings using a visible card are impossible, and the rest are rescaled so the strongest weight is 1
+        self.weights[(evaluator.COMBO_MASKS & np.uint64(sum(1 << card for card in board + dead))) != 0] = 0
+        self.weights = self.weights / self.weights.max()
@@ -0,0 +1,109 @@
+"""Precomputed preflop equity for the 169 starting-hand classes"""
+
+import json
+import os
+
+import numpy as np
+
+import evaluator
+from equity import estimate_equity
+
+# Equity table generated offline by build_preflop.py
+TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "preflop_equity.json")
+
+# Common opponent ranges, as the strongest fraction of all 1,326 holdings by equity against a random hand
+RANGE_FRACTIONS = {"top10": 0.10, "top20": 0.20, "top35": 0.35, "top50": 0.50}
+
+
+"""Returns the starting-hand class of two integer cards, e.g. AA, AKs or T9o"""
+def hand_class(cards):
+    high, low = max(cards), min(cards)
+    if high >> 2 == low >> 2:
+        return evaluator.RANKS[high >> 2] * 2
+    suited = "s" if high & 3 == low & 3 else "o"
+    return evaluator.RANKS[high >> 2] + evaluator.RANKS[low >> 2] + suited
+
+
+"""Returns the names of all 169 starting-hand classes, pairs first"""
+def all_classes():
+    classes = [rank * 2 for rank in reversed(evaluator.RANKS)]
+    for high in range(12, -1, -1):
+        for low in range(high - 1, -1, -1):
+            classes.append(evaluator.RANKS[high] + evaluator.RANKS[low] + "s")
+            classes.append(evaluator.RANKS[high] + evaluator.RANKS[low] + "o")
+    return classes
+
+
+"""Returns every holding (as a row of two integer cards) in the given starting-hand classes"""
+def class_combos(classes):
+    classes = set(classes)
+    return evaluator.COMBOS[[hand_class(combo) in classes for combo in evaluator.COMBOS]]
+
+
+"""Returns one holding of each class, used to compute that class's equity"""
+def representative(hand_class_name):
+    high = evaluator.RANKS.index(hand_class_name[0])
+    low = evaluator.RANKS.index(hand_class_name[1])
+    if len(hand_class_name) == 3 and hand_class_name[2] == "s":
+        return [high * 4, low * 4]
+    return [high * 4, low * 4 + 1]
+
+
+"""Computes the equity of every class against a random hand and each common range, and writes them to TABLE_PATH"""
+def write_table(samples=50000, path=TABLE_PATH, seed=0):
+
+    rng = np.random.default_rng(seed)
+    classes = all_classes()
+    equity = {}
+    for name in classes:
+        equity[name] = {"random": round(estimate_equity(representative(name), [], samples=samples, rng=rng)["equity"], 4)}
+
+    # Ranges take the strongest classes against a random hand until they cover their fraction of all holdings
+    by_strength = sorted(classes, key=lambda name: equity[name]["random"], reverse=True)
+    combos_in_class = {name: 6 if len(name) == 2 else (4 if name[2] == "s" else 12) for name in classes}
+    ranges = {}
+    for range_name in RANGE_FRACTIONS:
+        members = []
+        covered = 0
+        for name in by_strength:
+            if covered >= RANGE_FRACTIONS[range_name] * 1326:
+                break
+            members.append(name)
+            covered += combos_in_class[name]
+        ranges[range_name] = members
+
+        combos = class_combos(members)
+        for name in classes:
+            equity[name][range_name] = round(estimate_equity(representative(name), [], samples=samples, rng=rng, opponent_range=combos)["equity"], 4)
+
+    with open(path, "w") as f:
+        json.dump({"ranges": ranges, "equity": equity}, f, separators=(",", ":"))
+
+
+"""Reads the equity table once, returning empty tables if it hasn't been built"""
+def load_table(path=TABLE_PATH):
+    try:
+        with open(path) as f:
+            table = json.load(f)
+    except (OSError, ValueError):
+        return {}, {}
+    return table["ranges"], table["equity"]
+
+
+RANGES, EQUITY = load_table()
+
+
+"""Returns the preflop equity of two integer cards against a random hand or one of RANGES, None if the table hasn't been built"""
+def preflop_equity(cards, against="random"):
+    if not EQUITY:
+        return None
+    return EQUITY[hand_class(cards)][against]
+
+
+"""Returns the preflop equity of two integer cards against the strongest fraction (0 to 1) of all holdings, interpolated between RANGES and a random hand, None if the table hasn't been built"""
+def preflop_range_equity(cards, fraction):
+    if not EQUITY:
+        return None
+    entry = EQUITY[hand_class(cards)]
+    names = sorted(RANGE_FRACTIONS, key=RANGE_FRACTIONS.get)
+    return float(np.interp(fraction, [RANGE_FRACTIONS[name] for name in names] + [1], [entry[name] for name in names] + [entry["random"]]))
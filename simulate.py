@@ -0,0 +1,174 @@
+"""Plays bot-vs-bot heads-up matches across a process pool and reports how two bot configurations compare
+
+Usage:
+    python simulate.py --matches 1000 --a 0.9,0.7,0.4,0.5,0.2 --b 0.85,0.65,0.4,0.5,0.25
+
+Each configuration is raise_at,mixed_at,call_at,mix,bluff (see engine.BotConfig), or strategy for the solved strategy
+table (see strategy.py). Matches use the game's 1/2 blinds and 100-chip starting stacks and are played until one bot
+has no chips left.
+"""
+
+import argparse
+import math
+import os
+import random
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+from engine import BotConfig, Engine, InvalidAction, bot_raise_size, estimate_strength
+from equity import estimate_equity
+from equity_cache import EquityCache
+from strategy import load_strategy
+
+# Matches longer than this many hands are stopped and scored by their current stacks
+MAX_HANDS = 1000
+
+
+"""Returns a strength function (engine.estimate_strength with its own RNG, sample budget and suit-isomorphic cache)"""
+def cached_strength(samples, np_rng):
+    cache = EquityCache(200000)
+
+    def estimate(hand, board, opponent_range=None, opponent_weights=None):
+        return estimate_equity(hand, board, samples=samples, rng=np_rng, opponent_range=opponent_range, opponent_weights=opponent_weights)
+
+    def strength(hand, board, street, opp_range=None):
+        return estimate_strength(hand, board, street, opp_range, estimate, cache)
+
+    return strength
+
+
+"""Returns the player-side bot's action and raise size for the engine's step(), deciding from the mirrored seat"""
+def player_move(engine, state, config, strength):
+    seat = state.mirrored()
+    decision = config.decide(strength(state.hand, state.board, state.street), seat, engine.rng)
+    facing_bet = state.opp_bet > state.bet
+    if decision == "raise":
+        return "raise", bot_raise_size(seat)
+    if decision == "checkcall":
+        return ("call" if facing_bet else "check"), None
+    return ("fold" if facing_bet else "check"), None
+
+
+"""Plays one match between the player's seat and the engine's bot, returning (chips won by the player's seat, hands played)"""
+def play_match(player_config, bot_config, strength, rng):
+
+    engine = Engine(strength=strength, rng=rng, bot=bot_config, allin_equity=None)
+    state = engine.new_game()
+
+    # Hands are counted from the "Preflop:" entries in the log, starting with the one new_game() logged
+    hands = 0
+
+    while hands < MAX_HANDS:
+        action, raise_size = player_move(engine, state, player_config, strength)
+        try:
+            outcome = engine.step(state, action, raise_size)
+        except InvalidAction:
+            # A bot raise that breaks the min-raise rule (e.g. half of a tiny pot) becomes a check or call
+            outcome = engine.step(state, "call" if state.opp_bet > state.bet else "check")
+
+        # Showdowns that don't end the match lead straight into the next hand, which may itself be run out
+        while outcome == "showdown":
+            if engine.winner(state):
+                break
+            outcome = engine.next_hand(state)
+
+        hands += state.log.count("Preflop:")
+        state.log = []
+        state.dealt = []
+        if outcome == "showdown":
+            break
+
+    # A match stopped at MAX_HANDS returns each player's bet and splits the pot
+    if state.displayed == 0:
+        return state.chips + state.bet + state.pot / 2 - 100, hands
+    return state.chips - 100, hands
+
+
+"""Plays one shard of matches, alternating seats, and returns per-match (chips won by a, hands) lists"""
+def run_shard(shard):
+
+    seed, matches, config_a, config_b, samples = shard
+    rng = random.Random(seed)
+    strength = cached_strength(samples, np.random.default_rng(seed))
+
+    results = []
+    for i in range(matches):
+        if i % 2 == 0:
+            won, hands = play_match(config_a, config_b, strength, rng)
+        else:
+            won, hands = play_match(config_b, config_a, strength, rng)
+            won = -won
+        results.append((won, hands))
+    return results
+
+
+"""Returns a summary of match results for configuration a: win rate and bb/100 with 95% confidence intervals"""
+def summarize(results, seconds):
+
+    won = np.array([result[0] for result in results], dtype=float)
+    hands = np.array([result[1] for result in results], dtype=float)
+    n = len(results)
+
+    win_rate = float(np.mean(won > 0))
+    win_margin = 1.96 * math.sqrt(win_rate * (1 - win_rate) / n)
+
+    # bb/100 is a ratio of per-match sums, so its standard error comes from the residuals of that ratio
+    bb_per_hand = won.sum() / 2 / hands.sum()
+    residuals = won / 2 - bb_per_hand * hands
+    bb_margin = 1.96 * float(np.std(residuals, ddof=1)) / math.sqrt(n) / hands.mean() if n > 1 else float("inf")
+
+    return {
+        "matches": n,
+        "hands": int(hands.sum()),
+        "win_rate": win_rate,
+        "win_rate_ci": (win_rate - win_margin, win_rate + win_margin),
+        "bb_per_100": 100 * bb_per_hand,
+        "bb_per_100_ci": (100 * (bb_per_hand - bb_margin), 100 * (bb_per_hand + bb_margin)),
+        "hands_per_second": hands.sum() / seconds,
+    }
+
+
+"""Parses "raise_at,mixed_at,call_at,mix,bluff" into a BotConfig, or "strategy" into the solved strategy table"""
+def parse_config(text):
+    if text == "strategy":
+        strategy = load_strategy()
+        if strategy is None:
+            raise argparse.ArgumentTypeError("strategy table not built (run build_strategy.py)")
+        return strategy
+    return BotConfig(*[float(value) for value in text.split(",")])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bot-vs-bot heads-up self-play")
+    parser.add_argument("--matches", type=int, default=100)
+    parser.add_argument("--a", type=parse_config, default=BotConfig(), help="raise_at,mixed_at,call_at,mix,bluff or strategy")
+    parser.add_argument("--b", type=parse_config, default=BotConfig(), help="raise_at,mixed_at,call_at,mix,bluff or strategy")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--samples", type=int, default=500, help="equity samples per flop/turn estimate")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # Splits the matches into one shard per worker, each with its own seed (an even count keeps seats balanced)
+    shards = []
+    per_shard = math.ceil(args.matches / args.workers)
+    for i in range(args.workers):
+        count = min(per_shard, args.matches - i * per_shard)
+        if count > 0:
+            shards.append((args.seed * 1000003 + i, count, args.a, args.b, args.samples))
+
+    start = time.monotonic()
+    with Pool(len(shards)) as pool:
+        results = [result for shard in pool.map(run_shard, shards) for result in shard]
+    summary = summarize(results, time.monotonic() - start)
+
+    print("A: " + repr(args.a))
+    print("B: " + repr(args.b))
+    print("Matches: %d  Hands: %d  Hands/sec: %.0f" % (summary["matches"], summary["hands"], summary["hands_per_second"]))
+    print("A win rate: %.3f (95%% CI %.3f to %.3f)" % ((summary["win_rate"],) + summary["win_rate_ci"]))
+    print("A bb/100: %.1f (95%% CI %.1f to %.1f)" % ((summary["bb_per_100"],) + summary["bb_per_100_ci"]))
+
+
+if __name__ == "__main__":
+    main()
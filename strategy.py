@@ -0,0 +1,279 @@
+"""Precomputed bot strategy from a counterfactual regret minimization (CFR) solve of an abstracted heads-up game
+
+The abstract game plays one street at a time. Each player only knows their equity bucket, bets are half the pot and
+raises double the bet (the sizes bot_raise_size uses), and a street allows at most three bets. Showdowns pay out by how
+often each bucket beat the other bucket in sampled deals.
+"""
+
+import json
+import os
+from multiprocessing import Pool
+
+import numpy as np
+
+import evaluator
+from dealing import deal_batch
+from equity import estimate_equity, visible_board
+from preflop import preflop_equity
+
+# Strategy table generated offline by build_strategy.py
+STRATEGY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "strategy.json")
+
+STREETS = ["preflop", "flop", "turn", "river"]
+
+# Number of equal-frequency equity buckets per street
+BUCKETS = 8
+
+# Bets and raises allowed on one street
+MAX_BETS = 3
+
+# Equity samples per flop and turn spot while sampling deals
+SPOT_SAMPLES = 300
+
+# What each abstract action (c: check or call, b: bet, r: raise, f: fold) means for the bot
+DECISIONS = {"c": "checkcall", "b": "raise", "r": "raise", "f": "checkfold"}
+
+
+"""Returns each player's share of the pot after an abstract history, starting from half a pot each"""
+def contributions(history):
+    put_in = [0.5, 0.5]
+    for i, action in enumerate(history):
+        if action == "c":
+            put_in[i % 2] = max(put_in)
+        elif action == "b":
+            put_in[i % 2] = max(put_in) + 0.5
+        elif action == "r":
+            put_in[i % 2] = 0.5 + 2 * (max(put_in) - 0.5)
+    return put_in
+
+
+"""Returns True if an abstract history ends the street (a fold, a call or two checks)"""
+def is_terminal(history):
+    return history.endswith("f") or (len(history) >= 2 and history.endswith("c"))
+
+
+"""Returns the abstract actions available after a history"""
+def actions(history):
+    put_in = contributions(history)
+    if put_in[0] == put_in[1]:
+        return "cb"
+    if history.count("b") + history.count("r") >= MAX_BETS:
+        return "fc"
+    return "fcr"
+
+
+"""Returns every non-terminal history of the abstract street"""
+def decision_histories(history=""):
+    if is_terminal(history):
+        return []
+    histories = [history]
+    for action in actions(history):
+        histories += decision_histories(history + action)
+    return histories
+
+
+"""Returns the strength of each dealt hand on a street (as the bot would see it) and which player won each deal"""
+def sample_spots(task):
+
+    street, count, seed = task
+    rng = np.random.default_rng(seed)
+    deals = deal_batch(count, rng).astype(np.int64)
+
+    strengths = np.zeros((count, 2))
+    for i, row in enumerate(deals):
+        board = visible_board(row[4:9].tolist(), street)
+        for player in range(2):
+            hand = row[2 * player:2 * player + 2].tolist()
+            equity = preflop_equity(hand) if street == "preflop" else None
+            if equity is None:
+                equity = estimate_equity(hand, board, samples=SPOT_SAMPLES, rng=rng)["equity"]
+            strengths[i, player] = equity
+
+    # 1 if the first player wins the showdown, 0.5 for a chop and 0 otherwise
+    ranks_0 = evaluator.rank_many(np.concatenate([deals[:, 0:2], deals[:, 4:9]], axis=1))
+    ranks_1 = evaluator.rank_many(np.concatenate([deals[:, 2:4], deals[:, 4:9]], axis=1))
+    results = (ranks_0 > ranks_1) + 0.5 * (ranks_0 == ranks_1)
+
+    return strengths, results
+
+
+"""Returns the bucket edges of a street and, for every pair of buckets, how often it is dealt and the first player's net showdown share"""
+def bucket_matrices(strengths, results, buckets=BUCKETS):
+
+    edges = np.quantile(strengths, np.arange(1, buckets) / buckets)
+    bucket_0 = np.searchsorted(edges, strengths[:, 0], side="right")
+    bucket_1 = np.searchsorted(edges, strengths[:, 1], side="right")
+
+    frequency = np.zeros((buckets, buckets))
+    wins = np.zeros((buckets, buckets))
+    np.add.at(frequency, (bucket_0, bucket_1), 1)
+    np.add.at(wins, (bucket_0, bucket_1), results)
+
+    # Showdown value is frequency-weighted, so pairs that were never dealt count for nothing
+    showdown = 2 * wins - frequency
+    return edges, frequency / len(results), showdown / len(results)
+
+
+"""Runs CFR+ over the abstract street and returns the average strategy, as bucket-by-action probabilities for each history"""
+def solve(frequency, showdown, iterations=2000):
+
+    buckets = len(frequency)
+    histories = decision_histories()
+    regrets = {history: np.zeros((buckets, len(actions(history)))) for history in histories}
+    totals = {history: np.zeros((buckets, len(actions(history)))) for history in histories}
+
+    def current(history):
+        positive = regrets[history]
+        sums = positive.sum(axis=1, keepdims=True)
+        return np.where(sums > 0, positive / np.where(sums > 0, sums, 1), 1 / positive.shape[1])
+
+    def walk(history, reach_0, reach_1, weight):
+        """Returns both players' counterfactual values per bucket, updating regrets and strategy totals on the way"""
+
+        put_in = contributions(history)
+        if history.endswith("f"):
+            payoff = put_in[1] if (len(history) - 1) % 2 == 1 else -put_in[0]
+            return payoff * (frequency @ reach_1), -payoff * (frequency.T @ reach_0)
+        if is_terminal(history):
+            return put_in[0] * (showdown @ reach_1), -put_in[0] * (showdown.T @ reach_0)
+
+        player = len(history) % 2
+        sigma = current(history)
+        values = [np.zeros(buckets), np.zeros(buckets)]
+        action_values = np.zeros((buckets, sigma.shape[1]))
+        for a, action in enumerate(actions(history)):
+            if player == 0:
+                value_0, value_1 = walk(history + action, reach_0 * sigma[:, a], reach_1, weight)
+            else:
+                value_0, value_1 = walk(history + action, reach_0, reach_1 * sigma[:, a], weight)
+            action_values[:, a] = value_0 if player == 0 else value_1
+            values[1 - player] += value_1 if player == 0 else value_0
+
+        # CFR+ keeps regrets non-negative and weights later iterations more heavily in the average
+        values[player] = (sigma * action_values).sum(axis=1)
+        regrets[history] = np.maximum(regrets[history] + action_values - values[player][:, None], 0)
+        totals[history] += weight * (reach_0 if player == 0 else reach_1)[:, None] * sigma
+        return values[0], values[1]
+
+    for iteration in range(1, iterations + 1):
+        walk("", np.ones(buckets), np.ones(buckets), iteration)
+
+    strategy = {}
+    for history in histories:
+        sums = totals[history].sum(axis=1, keepdims=True)
+        strategy[history] = np.where(sums > 0, totals[history] / np.where(sums > 0, sums, 1), 1 / totals[history].shape[1])
+    return strategy
+
+
+"""Samples deals for every street across a process pool, solves each street and writes the strategy table to STRATEGY_PATH"""
+def write_strategy(samples=4000, iterations=2000, workers=None, path=STRATEGY_PATH, seed=0):
+
+    # Splits each street's samples into one task per worker, each with its own seed
+    workers = os.cpu_count() if workers is None else workers
+    tasks = []
+    for s, street in enumerate(STREETS):
+        for w in range(workers):
+            count = samples // workers + (1 if w < samples % workers else 0)
+            if count > 0:
+                tasks.append((street, count, seed * 1000003 + s * 1009 + w))
+    with Pool(workers) as pool:
+        sampled = pool.map(sample_spots, tasks)
+
+    table = {"buckets": BUCKETS, "edges": {}, "strategy": {}}
+    for street in STREETS:
+        parts = [sampled[i] for i, task in enumerate(tasks) if task[0] == street]
+        strengths = np.concatenate([part[0] for part in parts])
+        results = np.concatenate([part[1] for part in parts])
+
+        edges, frequency, showdown = bucket_matrices(strengths, results)
+        strategy = solve(frequency, showdown, iterations)
+        table["edges"][street] = [round(float(edge), 4) for edge in edges]
+        table["strategy"][street] = {history: np.round(strategy[history], 3).tolist() for history in strategy}
+
+    with open(path, "w") as f:
+        json.dump(table, f, separators=(",", ":"))
+
+
+class Strategy:
+    """Looks up the bot's move in a solved strategy table; decide() has the same signature as BotConfig.decide()"""
+
+    def __init__(self, table):
+        self.edges = {street: np.array(table["edges"][street]) for street in STREETS}
+        self.strategy = {street: {history: np.array(probabilities) for history, probabilities in table["strategy"][street].items()} for street in STREETS}
+
+    def __repr__(self):
+        return "Strategy(" + str(len(self.edges["river"]) + 1) + " buckets)"
+
+    def history(self, state):
+        """Returns the abstract history matching the bot's spot, where state.chips and state.bet belong to the bot's opponent"""
+
+        # The small blind acts first preflop and the big blind acts first after that
+        bot_first = state.position == ("bb" if state.street == "preflop" else "sb")
+
+        # Blinds don't count as bets, so a small blind completing preflop is treated like a check
+        opp_blind, bot_blind = 0, 0
+        if state.street == "preflop":
+            opp_blind, bot_blind = (1, 2) if state.position == "sb" else (2, 1)
+
+        facing = state.bet > state.opp_bet and state.bet > opp_blind
+        if not facing:
+            return "" if bot_first else "c"
+        if state.opp_bet <= bot_blind:
+            return "cb" if bot_first else "b"
+        return "br" if bot_first else "cbr"
+
+    def decide(self, hand_strength, state, rng):
+        """Returns the bot's choice ("raise", "checkcall" or "checkfold") sampled from the table"""
+
+        history = self.history(state)
+        bucket = int(np.searchsorted(self.edges[state.street], hand_strength, side="right"))
+        probabilities = self.strategy[state.street][history][bucket]
+
+        # Samples an action with one draw, then applies it like bot_decision (raising is pointless if either player is all in)
+        action = actions(history)[min(int(np.searchsorted(np.cumsum(probabilities), rng.random() * probabilities.sum(), side="right")), len(probabilities) - 1)]
+        can_raise = state.chips != 0 and state.bet < state.opp_chips + state.opp_bet
+        if DECISIONS[action] == "raise" and not can_raise:
+            return "checkcall"
+        return DECISIONS[action]
+
+
+    def decide_many(self, hand_strength, chips, bet, opp_chips, opp_bet, draws, street, position):
+        """Returns (raises, checkcalls) boolean arrays for many games at once, sampling each from the table with its draw like decide() (see engine.bot_decisions)"""
+
+        street, position = np.asarray(street), np.asarray(position)
+
+        # Same abstract history as history(), one array operation per rule
+        preflop = street == "preflop"
+        bot_first = position == np.where(preflop, "bb", "sb")
+        opp_blind = np.where(preflop, np.where(position == "sb", 1, 2), 0)
+        bot_blind = np.where(preflop, np.where(position == "sb", 2, 1), 0)
+        facing = (bet > opp_bet) & (bet > opp_blind)
+        history = np.where(~facing, np.where(bot_first, "", "c"),
+                           np.where(opp_bet <= bot_blind, np.where(bot_first, "cb", "b"), np.where(bot_first, "br", "cbr")))
+
+        # Games sharing a street and history share one probability table, so each group is bucketed and sampled at once
+        raises = np.zeros(len(hand_strength), dtype=bool)
+        checkcalls = np.zeros(len(hand_strength), dtype=bool)
+        for street_name in STREETS:
+            for history_name in set(history[street == street_name].tolist()):
+                rows = (street == street_name) & (history == history_name)
+                probabilities = self.strategy[street_name][history_name][np.searchsorted(self.edges[street_name], hand_strength[rows], side="right")]
+                targets = draws[rows] * probabilities.sum(axis=1)
+                choices = np.minimum((np.cumsum(probabilities, axis=1) <= targets[:, None]).sum(axis=1), probabilities.shape[1] - 1)
+                decisions = np.array([DECISIONS[action] for action in actions(history_name)])[choices]
+                raises[rows] = decisions == "raise"
+                checkcalls[rows] = decisions == "checkcall"
+
+        # Raising is pointless if either player is all in, so those raises become check/calls
+        can_raise = (chips != 0) & (bet < opp_chips + opp_bet)
+        checkcalls |= raises & ~can_raise
+        return raises & can_raise, checkcalls
+
+
+"""Reads the strategy table, returning None if it hasn't been built"""
+def load_strategy(path=STRATEGY_PATH):
+    try:
+        with open(path) as f:
+            return Strategy(json.load(f))
+    except (OSError, ValueError):
+        return None